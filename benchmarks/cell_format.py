@@ -0,0 +1,67 @@
+import argparse
+import io
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+from util import CellFormat
+
+row = ['vm-name', 4, 16.0, 120.5, 'Microsoft Windows Server 2016 (64-bit)'] + ['n2-standard-4', 97.09] * 3 + [0.0, 4.8, 12.0, 20.4]
+formats = ['std', 'std', 'gb', 'gb', 'std'] + ['std', 'curr'] * 3 + ['curr'] * 4
+
+
+# how cells were styled before named styles: new formats per row and every
+# style attribute assigned (and hashed by openpyxl) on every cell
+def per_cell(sheet, rows):
+    for row_index in range(rows):
+        color = 'EEEEEE' if not (row_index % 2) else None
+        row_formats = {
+            'std': CellFormat(sheet).color(color),
+            'curr': CellFormat(sheet).color(color).currency(),
+            'gb': CellFormat(sheet).color(color).gb()
+        }
+        sheet.append([
+            row_formats[format].format(openpyxl.cell.cell.Cell(sheet, column=1, row=1, value=value))
+            for format, value in zip(formats, row)
+        ])
+
+
+def shared(sheet, rows):
+    row_formats = {
+        color: {
+            'std': CellFormat(sheet).color(color),
+            'curr': CellFormat(sheet).color(color).currency(),
+            'gb': CellFormat(sheet).color(color).gb()
+        } for color in ['EEEEEE', None]
+    }
+    for row_index in range(rows):
+        color = 'EEEEEE' if not (row_index % 2) else None
+        sheet.append([
+            row_formats[color][format].value(value)
+            for format, value in zip(formats, row)
+        ])
+
+
+def measure(function, rows, write_only):
+    output = openpyxl.Workbook(write_only=write_only)
+    sheet = output.create_sheet('bench')
+    start = perf_counter()
+    function(sheet, rows)
+    elapsed = perf_counter() - start
+    output.save(io.BytesIO())
+    return rows * len(row) / elapsed
+
+
+if (__name__=="__main__"):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", type=int, default=20000, help="rows to style")
+    parser.add_argument("-st", "--streaming", action='store_true', help="use a write-only workbook")
+    args = parser.parse_args()
+
+    before = measure(per_cell, args.rows, args.streaming)
+    after = measure(shared, args.rows, args.streaming)
+    print(f"per-cell styles:\t{before:,.0f} cells/s")
+    print(f"shared styles:\t\t{after:,.0f} cells/s ({after/before:.1f}x)")
@@ -0,0 +1,140 @@
+import argparse
+import html
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricing.gcve_frame import region_codes
+
+# A frozen set of pricing documents, laid out like the pages they stand for
+# and named as the documents the price list fetches, so it loads offline
+# through the --local path. Prices are made up but stable: the same
+# structure every run, regions a fixed percentage apart.
+regions = ['us-central1', 'us-east1', 'europe-west1', 'southamerica-east1', 'asia-southeast1']
+
+# hourly vCPU and GB prices of each family
+families = {
+    'e2': (0.021811, 0.002923),
+    'n2': (0.031611, 0.004237),
+    'n2d': (0.027502, 0.003686),
+    'n1': (0.031611, 0.004237),
+    'c2': (0.03398, 0.00455),
+}
+# GB of memory per vCPU of each kind
+kinds = {'standard': 4, 'highmem': 8, 'highcpu': 1}
+sizes = [2, 4, 8, 16, 32, 48, 64, 80, 96]
+
+# monthly GB prices
+disks = {
+    'Standard provisioned space': 0.04,
+    'Balanced provisioned space': 0.1,
+    'SSD provisioned space': 0.17,
+    'Extreme provisioned space': 0.125,
+    'Extreme provisioned IOPS': 0.065,
+}
+
+# bold tier prices of the premium images and the per vCPU ones
+licenses = '''<h3 id="rhel_images">RHEL</h3>
+<p>RHEL images:<ul><li><strong>$0.06 USD/hour</strong> for 1-4 vCPU</li><li><strong>$0.13 USD/hour</strong> for more than 4 vCPU</li></ul></p>
+<h3 id="rhel_sap_images">RHEL for SAP</h3>
+<p>RHEL for SAP images:<ul><li><strong>$0.10 USD/hour</strong> for 1-4 vCPU</li><li><strong>$0.225 USD/hour</strong> for more than 4 vCPU</li></ul></p>
+<h3 id="suse_images">SLES</h3>
+<p>SLES images:<ul><li><strong>$0.02 USD/hour</strong> for f1-micro</li><li><strong>$0.11 USD/hour</strong> for all other machine types</li></ul></p>
+<h3 id="suse_sap_images">SLES for SAP</h3>
+<p>SLES for SAP images:<ul><li><strong>$0.17 USD/hour</strong> for 1-2 vCPU</li><li><strong>$0.34 USD/hour</strong> for 3-4 vCPU</li><li><strong>$0.41 USD/hour</strong> for more than 4 vCPU</li></ul></p>
+<h3 id="windows_server_pricing">Windows</h3>
+<ul><li>f1-micro: $0.02 USD/hour</li><li>All other machine types: $0.046 USD/hour per visible vCPU</li></ul>
+<h3 id="sql_server_pricing">SQL Server</h3>
+<ul><li>SQL Server Standard: $0.1645 USD/hour per visible vCPU</li><li>SQL Server Web: $0.011 USD/hour per visible vCPU</li><li>SQL Server Enterprise: $0.399 USD/hour per visible vCPU</li></ul>
+'''
+
+
+def factor(region:str) -> float:
+    return 1 + regions.index(region) * 0.07
+
+
+def by_region(price:float) -> dict:
+    return {"priceByRegion": {region.replace('-', ''): "%.6f" % (price * factor(region)) for region in regions}}
+
+
+def table(layout:dict) -> str:
+    return '<cloudx-pricing-table layout="%s"></cloudx-pricing-table>\n' % html.escape(repr(layout), quote=True)
+
+
+def unit_table(item:str, cpu:float, memory:float) -> str:
+    return table({"rows": [
+        {"cells": ["Item", "Price (USD)", "Spot price (USD)", "1-year commitment (USD)", "3-year commitment (USD)"]},
+        {"cells": [f"{item} vCPUs", by_region(cpu), by_region(cpu*0.3), by_region(cpu*0.63), by_region(cpu*0.45)]},
+        {"cells": [f"{item} Memory", by_region(memory), by_region(memory*0.3), by_region(memory*0.63), by_region(memory*0.45)]}
+    ]})
+
+
+def all_pricing() -> str:
+    parts = ['<html><body><h1>All pricing</h1>\n']
+    for family, (cpu, memory) in families.items():
+        rows = [{"cells": ["Machine type", "Virtual CPUs", "Memory", "Price (USD)", "Spot price (USD)", "1-year commitment price (USD)", "3-year commitment price (USD)"]}]
+        for kind, ratio in kinds.items():
+            for size in sizes:
+                price = cpu*size + memory*size*ratio
+                rows.append({"cells": [
+                    f"{family}-{kind}-{size}", str(size), f"{size*ratio}GB",
+                    by_region(price), by_region(price*0.3), by_region(price*0.63), by_region(price*0.45)
+                ]})
+        parts.append(f'<h3 id="{family}_machine_types">{family}</h3>\n')
+        parts.append(table({"rows": rows, "collapsible": True}))
+        parts.append(f'<h3 id="{family}_standard">{family} predefined</h3>\n')
+        parts.append(unit_table("Predefined", cpu, memory))
+        if family != 'c2':
+            parts.append(f'<h4 id="{family}_custommachinetypepricing">{family} custom</h4>\n')
+            parts.append(unit_table("Custom", cpu*1.05, memory*1.05))
+
+    rows = [{"cells": ["Type", "Price (per GB / month)"]}]
+    for name in disks:
+        rows.append({"cells": [name, {"taxonomy": "gcp.compute.disk.%s" % name.lower().replace(' ', '_')}]})
+    parts.append('<div><h3 id="persistentdisk">Disk</h3>\n')
+    parts.append(table({"rows": rows}))
+    parts.append('</div>\n')
+    parts.append(licenses)
+    parts.append('</body></html>\n')
+    return ''.join(parts)
+
+
+def compute_json() -> dict:
+    return {"gcp": {"compute": {"disk": {
+        name.lower().replace(' ', '_'): {"regions": {
+            region: {"price": [{"currencyCode": "USD", "units": "0", "nanos": int(price * factor(region) * 1e9)}]}
+            for region in regions
+        }} for name, price in disks.items()
+    }}}}
+
+
+def gcve_frame() -> str:
+    hourly = lambda price: ' '.join('%s-hourly="$%.4f"' % (region_codes[region], price * factor(region)) for region in regions)
+    return (
+        '<html><body><table><thead><tr><th>Node</th><th>Price</th></tr></thead><tbody>'
+        f'<tr><td>ve1-standard-72</td><td {hourly(9.0)}><td {hourly(6.3)}></td><td></td><td {hourly(4.2)}></td></td></tr>'
+        '</tbody></table></body></html>'
+    )
+
+
+def build(directory:str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    documents = {
+        'all-pricing.html': all_pricing(),
+        'gcp-compute.json': json.dumps(compute_json()),
+        'vmware-engine-pricing.html': '<html><body><iframe src="https://cloud.google.com/vmware-engine/pricing-frame"></iframe></body></html>',
+        'vmware-engine-frame.html': gcve_frame(),
+    }
+    for name, text in documents.items():
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as document:
+            document.write(text)
+    return directory
+
+
+if (__name__=="__main__"):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs='?', default="fixture", help="directory the documents are written to")
+    args = parser.parse_args()
+    print(f"price fixture written to {build(args.directory)}, load it with -l {args.directory}")
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+import estimate_rvtools
+from pricing import PriceList
+from util import StreamingSheet
+from records import RecordWriter
+from benchmarks import fixture, synthetic
+
+
+# The peak resident memory is reset before each stage where linux allows
+# it, elsewhere it is the peak of the process so far. Tracing allocations
+# also gives the peak of the python objects a stage created, but slows
+# allocation heavy stages down several times.
+def reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # kilobytes on linux, bytes on macos
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def measure(stages, name, trace, function, *args):
+    reset_peak_rss()
+    if trace:
+        tracemalloc.start()
+    start = perf_counter()
+    value = function(*args)
+    elapsed = perf_counter() - start
+    stages[name] = {"seconds": round(elapsed, 4), "peak_rss_mb": round(peak_rss(), 1)}
+    if trace:
+        stages[name]["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+    print(f"\t{name}: {elapsed:.2f}s, {stages[name]['peak_rss_mb']} MB" + (f" ({stages[name]['traced_peak_mb']} MB traced)" if trace else ""))
+    return value
+
+
+# one quote at a time, as the menu asks for them; vms no shape fits are
+# skipped like the estimate skips their rows
+def select_prices(price_list, vms, regions):
+    for vm in vms:
+        for region in regions:
+            try:
+                price_list.select_price("od", vm[1], vm[2], region)
+            except IndexError:
+                pass
+
+
+def write_workbook(book_name, rows, regions, streaming, stages, trace):
+    output = openpyxl.Workbook(write_only=streaming)
+    if streaming:
+        summary = StreamingSheet(output.create_sheet("Summary"))
+    else:
+        summary = output.active
+        summary.title = "Summary"
+    book = measure(stages, "process_file", trace, estimate_rvtools.process_file, book_name, rows, output, regions, len(regions), streaming)
+    measure(stages, "create_summary", trace, estimate_rvtools.create_summary, summary, regions, len(regions), [book_name], 1, None, (1, 1), [book])
+    if streaming:
+        summary.flush()
+    measure(stages, "save", trace, output.save, "estimated-rvtools.xlsx")
+    output.close()
+
+
+def write_records(book_name, rows, regions):
+    writer = RecordWriter("estimated-rvtools.jsonl", "jsonl")
+    book = estimate_rvtools.process_records(writer, book_name, rows, regions)
+    estimate_rvtools.write_total_records(writer, regions, [book])
+    writer.close()
+
+
+def run_size(price_list, vms, regions, streaming, trace):
+    book_name = f"synthetic-{vms}.xlsx"
+    if not os.path.exists(book_name):
+        print(f"generating {book_name}...")
+        synthetic.write_vinfo(book_name, vms)
+
+    print(f"{book_name}:")
+    stages = {}
+    errors, book_vms = measure(stages, "read_book", trace, estimate_rvtools.read_book, book_name, 1, False)
+    book_vms = [vm for row_index, vm in book_vms]
+    measure(stages, "select_price", trace, select_prices, price_list, book_vms, regions)
+    quotes = measure(stages, "price_vms", trace, estimate_rvtools.price_vms, book_vms, regions)
+    rows = measure(stages, "priced_rows", trace, lambda: list(estimate_rvtools.priced_rows(enumerate(book_vms, 1), regions, quotes, False)))
+    write_workbook(book_name, rows, regions, streaming, stages, trace)
+    measure(stages, "records", trace, write_records, book_name, rows, regions)
+    return {"vms": vms, "rows": len(rows), "stages": stages}
+
+
+if (__name__=="__main__"):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--vms", type=int, nargs='*', default=[1000, 10000, 100000], help="sizes of the synthetic vInfo sheets")
+    parser.add_argument("-r", "--regions", nargs='*', default=['us-central1', 'europe-west1'], help="regions to price")
+    parser.add_argument("-l", "--local", default=None, help="directory of recorded pricing documents (default: the frozen fixture)")
+    parser.add_argument("-w", "--work", default=None, help="directory for the generated workbooks, kept between runs (default: a temporary one)")
+    parser.add_argument("-st", "--streaming", action='store_true', help="write the workbooks in streaming mode")
+    parser.add_argument("-m", "--trace-memory", action='store_true', help="also trace the python allocations of each stage (slower)")
+    parser.add_argument("-o", "--output", default="pipeline-%s.json" % datetime.now().strftime("%Y%m%d-%H%M%S"), help="json file with the results")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    work = os.path.abspath(args.work or tempfile.mkdtemp(prefix="rvtools-benchmark-"))
+    os.makedirs(work, exist_ok=True)
+    # the price list keeps its cache in the working directory
+    os.chdir(work)
+    local = os.path.abspath(args.local) if not args.local is None else fixture.build(os.path.join(work, "fixture"))
+
+    results = {
+        "started": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "regions": args.regions,
+        "streaming": args.streaming,
+        "traced": args.trace_memory,
+        "price_list": {},
+        "sizes": []
+    }
+    print("price list:")
+    measure(results["price_list"], "cold", args.trace_memory, PriceList, args.regions, "monthly", True, local)
+    price_list = measure(results["price_list"], "warm", args.trace_memory, PriceList, args.regions, "monthly", False, local)
+    estimate_rvtools.price_list = price_list
+
+    for vms in args.vms:
+        results["sizes"].append(run_size(price_list, vms, args.regions, args.streaming, args.trace_memory))
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"results written to {output}")
@@ -0,0 +1,69 @@
+import argparse
+import os
+import re
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from pricing import Licenses, PricingPage
+
+body = re.compile('<body[^>]*>(.*)</body>', re.DOTALL | re.IGNORECASE)
+
+
+# how the page was parsed before: a full soup, then a scan of the previous
+# siblings of every table for its heading
+def soup(html_text):
+    page = BeautifulSoup(html_text, 'html.parser')
+    tables = [
+        (next(iter([sibling.get('id') for sibling in data.find_previous_siblings() if (
+            sibling.name in ['h3', 'h4']
+        )] or []), None), data.get('layout'))
+        for data in page.find_all('cloudx-pricing-table')
+    ]
+    Licenses(page).parse()
+    return tables
+
+
+def single_pass(html_text):
+    page = PricingPage(Licenses.sections).parse(html_text)
+    Licenses(BeautifulSoup(page.html, 'html.parser')).parse()
+    return page.tables
+
+
+# the page body is repeated to get closer to the size of the live page
+def load(path, repeat):
+    with open(path) as page:
+        html_text = page.read()
+    match = body.search(html_text)
+    if repeat <= 1 or match is None:
+        return html_text
+    return html_text[:match.start(1)] + match.group(1) * repeat + html_text[match.end(1):]
+
+
+def measure(function, html_text, runs):
+    best = None
+    for run in range(runs):
+        start = perf_counter()
+        tables = function(html_text)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, tables
+
+
+if (__name__=="__main__"):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--page", default="html/all-pricing.html", help="all-pricing page to parse")
+    parser.add_argument("-x", "--repeat", type=int, default=1, help="times the page body is repeated")
+    parser.add_argument("-n", "--runs", type=int, default=3, help="runs per parser, the best is reported")
+    args = parser.parse_args()
+
+    html_text = load(args.page, args.repeat)
+    before, expected = measure(soup, html_text, args.runs)
+    after, tables = measure(single_pass, html_text, args.runs)
+    if tables != expected:
+        print("WARNING! the single pass parser found different tables")
+    print(f"page:\t\t{len(html_text)/1024/1024:.1f} MB, {len(tables)} tables")
+    print(f"soup:\t\t{before:.2f}s")
+    print(f"single pass:\t{after:.2f}s ({before/after:.1f}x)")
@@ -0,0 +1,211 @@
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fixture, synthetic
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+regions = ['us-central1', 'europe-west1']
+
+
+# http.client over the unix socket of serve.py -u
+class UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path:str) -> None:
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class Client:
+    def __init__(self, address) -> None:
+        self.address = address
+
+    def connect(self):
+        if isinstance(self.address, str):
+            return UnixConnection(self.address)
+        return http.client.HTTPConnection(*self.address)
+
+    def raw(self):
+        if isinstance(self.address, str):
+            raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            raw = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        raw.settimeout(5)
+        raw.connect(self.address)
+        return raw
+
+    def request(self, method:str, path:str, body=None):
+        connection = self.connect()
+        data = body if isinstance(body, (bytes, type(None))) else json.dumps(body).encode("utf-8")
+        connection.request(method, path, data)
+        response = connection.getresponse()
+        result = response.status, json.loads(response.read())
+        connection.close()
+        return result
+
+
+# starts serve.py and waits for it to listen; the prices refresh every
+# refresh minutes so that some requests run across a swap
+def start(work:str, local:str, socket_path:str=None, refresh:float=0.02):
+    command = [sys.executable, "-u", os.path.join(root, "serve.py"), "-r", *regions, "-l", local, "-P", "0", "-rf", str(refresh)]
+    if not socket_path is None:
+        command.extend(["-u", socket_path])
+    server = subprocess.Popen(command, cwd=work, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    lines = []
+    for line in server.stdout:
+        lines.append(line)
+        if line.startswith("serving quotes on "):
+            address = line.split(" on ", 1)[1].strip()
+            if address.startswith("unix:"):
+                return server, address[len("unix:"):], lines
+            host, port = address[len("http://"):].rsplit(":", 1)
+            return server, (host, int(port)), lines
+    raise RuntimeError("serve.py did not start:\n" + "".join(lines))
+
+
+# keeps reading the output of the server while it serves, refreshed is set
+# once it has swapped in new prices
+def follow(server, lines:list):
+    refreshed = threading.Event()
+    def read():
+        for line in server.stdout:
+            lines.append(line)
+            if line.startswith("prices refreshed"):
+                refreshed.set()
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    return reader, refreshed
+
+
+# the records the estimate writes with --format json for the same book
+def estimate_records(work:str, local:str, book:str) -> list:
+    before = set(os.listdir(work))
+    subprocess.run([sys.executable, os.path.join(root, "estimate_rvtools.py"), "-r", *regions, "-l", local, "-f", "json", "-s", book],
+        cwd=work, capture_output=True, check=True)
+    [output] = [name for name in set(os.listdir(work)) - before if name.startswith("estimated-rvtools-")]
+    with open(os.path.join(work, output)) as records:
+        return json.load(records)
+
+
+# how many responses a connection gets before the server closes it
+def responses_until_closed(client, request:bytes) -> int:
+    raw = client.raw()
+    raw.sendall(request)
+    received = b""
+    try:
+        while True:
+            data = raw.recv(65536)
+            if not data:
+                break
+            received += data
+    except socket.timeout:
+        pass
+    raw.close()
+    return received.count(b"HTTP/1.1 ")
+
+
+def check_quotes(client, book:str, expected:list, failures:list) -> None:
+    def check(name, condition, detail=""):
+        print(f"\t{'ok' if condition else 'FAILED'}\t{name}" + ("" if condition else f": {detail}"))
+        if not condition:
+            failures.append(name)
+
+    status, health = client.request("GET", "/health")
+    check("health", status == 200 and health["regions"] == regions, health)
+
+    status, quote = client.request("POST", "/quote", {"name": "vm1", "cpus": 4, "memory": 16, "disk": 100, "os": "Microsoft Windows Server 2019 (64-bit)"})
+    vms = [record for record in quote.get("records", []) if record["record"] == "vm"]
+    check("quote", status == 200 and [record["region"] for record in vms] == regions and all(record["license"] > 0 for record in vms), quote)
+
+    status, error = client.request("POST", "/quote", {"cpus": 4, "memory": 16, "regions": ["asia-east9"]})
+    check("quote of a region not loaded", status == 400, error)
+    status, error = client.request("POST", "/quote", {"cpus": 4000, "memory": 16})
+    check("quote of a vm no machine type fits", status == 422, error)
+
+    batch = {"vms": [{"cpus": 2, "memory": 4}, {"cpus": 8, "memory": 64, "disk": 500}, {"cpus": 4000, "memory": 16}], "regions": ["us-central1"]}
+    status, result = client.request("POST", "/batch", batch)
+    check("batch", status == 200 and len(result["records"]) == 2 + 3 and len(result["errors"]) == 1, result)
+
+    with open(book, "rb") as upload:
+        body = upload.read()
+    status, result = client.request("POST", f"/vinfo?name={os.path.basename(book)}", body)
+    check("vinfo matches the estimate", status == 200 and result["records"] == expected, status)
+
+    # an error sent before the body is read must not leave it to be parsed
+    # as the next request of the connection
+    smuggled = b"GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n"
+    for name, head in [
+        ("404", b"POST /nope HTTP/1.1\r\nHost: localhost\r\n"),
+        ("400 before reading the body", b"POST /vinfo?regions=asia-east9 HTTP/1.1\r\nHost: localhost\r\n"),
+    ]:
+        responses = responses_until_closed(client, head + b"Content-Length: %d\r\n\r\n" % len(smuggled) + smuggled)
+        check(f"connection closed after a {name}", responses == 1, f"{responses} responses")
+    responses = responses_until_closed(client, b"POST /batch HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n" % (1 << 40) + smuggled)
+    check("connection closed after a 413", responses == 1, f"{responses} responses")
+
+
+def check_concurrency(client, requests:int, threads:int, failures:list) -> float:
+    batch = {"vms": [{"cpus": cpus, "memory": memory} for cpus in (1, 2, 4, 8, 16) for memory in (2, 8, 32)]}
+    def call(index):
+        status, result = client.request("POST", "/batch", batch)
+        return status, json.dumps(result, sort_keys=True)
+    started = perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(call, range(requests)))
+    elapsed = perf_counter() - started
+    same = all(status == 200 for status, result in results) and len(set(result for status, result in results)) == 1
+    print(f"\t{'ok' if same else 'FAILED'}\t{requests} concurrent batches from {threads} clients, {requests/elapsed:.0f} requests/s")
+    if not same:
+        failures.append("concurrency")
+    return requests/elapsed
+
+
+if (__name__=="__main__"):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--vms", type=int, default=1000, help="vms of the uploaded vInfo sheet")
+    parser.add_argument("-c", "--requests", type=int, default=500, help="concurrent batch requests")
+    parser.add_argument("-t", "--threads", type=int, default=32, help="concurrent clients")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="rvtools-serve-")
+    local = fixture.build(os.path.join(work, "fixture"))
+    book = synthetic.write_vinfo(os.path.join(work, f"synthetic-{args.vms}.xlsx"), args.vms)
+    expected = estimate_records(work, local, book)
+
+    failures = []
+    for name, socket_path in [("tcp", None), ("unix socket", os.path.join(work, "quotes.sock"))]:
+        print(f"{name}:")
+        server, address, lines = start(work, local, socket_path)
+        reader, refreshed = follow(server, lines)
+        try:
+            client = Client(address)
+            check_quotes(client, book, expected, failures)
+            check_concurrency(client, args.requests, args.threads, failures)
+            # short runs can end before the first refresh is due
+            refreshed.wait(30)
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+            reader.join()
+        refreshes = sum(1 for line in lines if line.startswith("prices refreshed"))
+        print(f"\t{'ok' if refreshes > 0 else 'FAILED'}\t{refreshes} price refreshes while serving")
+        if refreshes == 0:
+            failures.append(f"{name} refresh")
+
+    if len(failures) > 0:
+        print(f"WARNING! failed: {', '.join(failures)}")
+        sys.exit(1)
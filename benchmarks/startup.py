@@ -0,0 +1,87 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fixture
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds each entry point may take to import, and the modules it must not
+# load until they are needed: the scraping stack only without a warm cache
+# and openpyxl only when a workbook is written
+budgets = {
+    'pricing': (0.5, ['requests', 'bs4', 'openpyxl']),
+    'price_loader': (0.5, ['requests', 'bs4', 'openpyxl']),
+    'menu': (0.75, ['requests', 'bs4', 'openpyxl']),
+    'estimate_rvtools': (0.75, ['requests', 'bs4', 'openpyxl']),
+}
+# seconds for price_loader.py to load a warm cache, interpreter included
+warm_budget = 1.0
+
+probe = '''
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+# lazily imported modules sit in sys.modules unloaded until first used
+loaded = [name for name in {heavy!r} if name in sys.modules and type(sys.modules[name]).__name__ == 'module']
+print(elapsed, ','.join(loaded))
+'''
+
+
+# best of a few fresh interpreters, None when a dependency is not installed
+def import_time(module, heavy, runs):
+    best, loaded = None, []
+    for run in range(runs):
+        result = subprocess.run([sys.executable, '-c', probe.format(module=module, heavy=heavy)], cwd=root, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        elapsed, modules = (result.stdout.strip().splitlines()[-1].split(' ') + [''])[:2]
+        best = float(elapsed) if best is None else min(best, float(elapsed))
+        loaded = [name for name in modules.split(',') if name]
+    return best, loaded
+
+
+def warm_start(runs):
+    work = tempfile.mkdtemp(prefix="rvtools-startup-")
+    local = fixture.build(os.path.join(work, "fixture"))
+    command = [sys.executable, os.path.join(root, 'price_loader.py'), '-r', 'us-central1', '-l', local]
+    # the first run fills the cache
+    subprocess.run(command, cwd=work, capture_output=True, check=True)
+    best = None
+    for run in range(runs):
+        started = perf_counter()
+        subprocess.run(command, cwd=work, capture_output=True, check=True)
+        elapsed = perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if (__name__=="__main__"):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--runs", type=int, default=3, help="runs per measure, the best is reported")
+    args = parser.parse_args()
+
+    over = []
+    for module, (budget, heavy) in budgets.items():
+        elapsed, loaded = import_time(module, heavy, args.runs)
+        if elapsed is None:
+            print(f"{module}:\tskipped ({loaded})")
+            continue
+        print(f"{module}:\t{elapsed:.3f}s (budget {budget}s)" + (f", loaded {', '.join(loaded)}" if loaded else ""))
+        if elapsed > budget or len(loaded) > 0:
+            over.append(module)
+
+    elapsed = warm_start(args.runs)
+    print(f"price_loader.py on a warm cache:\t{elapsed:.3f}s (budget {warm_budget}s)")
+    if elapsed > warm_budget:
+        over.append('price_loader.py')
+
+    if len(over) > 0:
+        print(f"WARNING! over budget: {', '.join(over)}")
+        sys.exit(1)
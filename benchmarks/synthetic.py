@@ -0,0 +1,78 @@
+import argparse
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+
+# vInfo columns of an RVTools export, the ones read by the estimate among
+# a few of the usual others
+columns = [
+    'VM', 'Powerstate', 'Template', 'DNS Name', 'CPUs', 'Memory', 'NICs', 'Disks',
+    'Provisioned MiB', 'In Use MiB', 'Datacenter', 'Cluster', 'Host',
+    'OS according to the configuration file', 'OS according to the VMware Tools'
+]
+
+# weights loosely following what customer exports look like: mostly small
+# vms, memory a few GB per vCPU and a long tail of large disks
+cpus_weights = {1: 10, 2: 30, 4: 30, 8: 18, 16: 8, 32: 3, 64: 1}
+memory_weights = {1: 10, 2: 25, 4: 40, 8: 20, 16: 5}
+os_weights = {
+    'Microsoft Windows Server 2019 (64-bit)': 20,
+    'Microsoft Windows Server 2016 (64-bit)': 15,
+    'Microsoft Windows Server 2012 (64-bit)': 5,
+    'Red Hat Enterprise Linux 8 (64-bit)': 12,
+    'Red Hat Enterprise Linux 7 (64-bit)': 8,
+    'SUSE Linux Enterprise 15 (64-bit)': 5,
+    'SUSE Linux Enterprise 12 (64-bit)': 3,
+    'Ubuntu Linux (64-bit)': 15,
+    'CentOS 7 (64-bit)': 12,
+    'Other Linux (64-bit)': 5,
+}
+# median disk of 100 GB, capped at 16 TB
+disk_median = 100 * 1024
+disk_max = 16 * 1024 * 1024
+
+
+def choose(rng:random.Random, weights:dict, count:int) -> list:
+    return rng.choices(list(weights), weights=list(weights.values()), k=count)
+
+
+def vinfo_rows(vms:int, seed:int=0):
+    rng = random.Random(seed)
+    cpus = choose(rng, cpus_weights, vms)
+    memory = choose(rng, memory_weights, vms)
+    systems = choose(rng, os_weights, vms)
+    for index in range(vms):
+        disk = int(min(disk_max, rng.lognormvariate(math.log(disk_median), 1)))
+        # the configured os is missing now and then, the tools one is read instead
+        os_conf = None if rng.random() < 0.05 else systems[index]
+        yield [
+            f'vm-{index:06d}', 'poweredOn', False, f'vm-{index:06d}.example.com',
+            cpus[index], cpus[index] * memory[index] * 1024, 1, rng.randint(1, 4),
+            disk, int(disk * rng.uniform(0.2, 0.9)),
+            'DC1', f'cluster-{index % 8}', f'esx-{index % 64:02d}.example.com',
+            os_conf, systems[index]
+        ]
+
+
+def write_vinfo(path:str, vms:int, seed:int=0) -> str:
+    output = openpyxl.Workbook(write_only=True)
+    sheet = output.create_sheet('vInfo')
+    sheet.append(columns)
+    for row in vinfo_rows(vms, seed):
+        sheet.append(row)
+    output.save(path)
+    return path
+
+
+if (__name__=="__main__"):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="workbook to write")
+    parser.add_argument("-n", "--vms", type=int, default=1000, help="vms in the vInfo sheet")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generator")
+    args = parser.parse_args()
+    write_vinfo(args.path, args.vms, args.seed)
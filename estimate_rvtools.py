@@ -6,14 +6,24 @@ from datetime import datetime
 from genericpath import exists
 import sys
 from pricing import PriceList, parse_args
-from util import CellFormat
-import openpyxl
+from pricing.price_list import classify_os
+from util import CellFormat, ColumnTotals, ColumnWidths, StreamingSheet, lazy_import
+from vinfo import open_vinfo
+from packing import Packing, node_types
+from profiler import Profiler
+from records import RecordWriter, vm_records, total_record
+import numpy as np
 import operator
+openpyxl = lazy_import('openpyxl')
 from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 
 import os
 import traceback
 import math
+import telemetry
+from time import perf_counter
 
 commit_colors = {
     "OD": "FFD8CE",
@@ -21,57 +31,118 @@ commit_colors = {
     "3Y": "DDE8CB"
 }
 
-def process_row(sheet, row_index, row, regions, columns, optimization):
+# offset of the price column of each commit within a region
+commits_name={
+    1: "OD",
+    3: "1Y",
+    5: "3Y"
+}
+
+commits_column={
+    1: "od",
+    3: "cud1y",
+    5: "cud3y"
+}
 
+required_columns = [
+    'VM',
+    'CPUs',
+    'Memory',
+    'Provisioned MiB',
+    'OS according to the configuration file',
+    'OS according to the VMware Tools'
+]
+
+def read_vm(row, columns, optimization):
         [vm, cpus, memory, disk, os_conf, os_tools] = operator.itemgetter(
-            columns['VM'], 
-            columns['CPUs'], 
-            columns['Memory'], 
-            columns['Provisioned MiB'], 
-            columns['OS according to the configuration file'], 
-            columns['OS according to the VMware Tools']
+            *[columns[column] for column in required_columns]
         )(row)
         disk = max(10, round(disk/1024, 2))
         cpus = math.ceil(optimization*cpus)
+        return [vm, cpus, memory, disk, os_conf or os_tools]
+
+def price_vms(vms, regions):
+    cpus = [vm[1] for vm in vms]
+    memory = [vm[2] for vm in vms]
+    quotes = {}
+    for region in regions:
+        for commit in ["od", "cud1y"]:
+            quotes[(region, commit)] = price_list.select_prices_batch(commit, cpus, memory, region)
+    return quotes
+
+def vm_row(vm_data, regions, quotes):
+        [vm, cpus, memory, disk, os] = vm_data
 
-        os = os_conf or os_tools
         os_price = None
         if isinstance(os, str):
             os_price = price_list.get_os_price(os, cpus)
 
-
-        color = 'EEEEEE' if not (row_index % 2) else None
-
-        std = CellFormat(sheet).color(color)
-        curr = CellFormat(sheet).color(color).currency()
-        gb = CellFormat(sheet).color(color).gb()
-
-        data=[
-            std.value(vm), 
-            std.value(cpus), 
-            gb.value(memory/1024), 
-            gb.value(disk), 
-            std.value(os)
-        ]
+        data=[vm, cpus, memory/1024, disk, os]
 
         for region in regions:
-            od = price_list.select_price("od", cpus, memory, region)
-            cud = price_list.select_price("cud1y", cpus, memory, region)
+            od = quotes[(region, "od")]
+            cud = quotes[(region, "cud1y")]
+            if od is None or cud is None:
+                raise IndexError(f"no machine type found for {cpus} vCPUs and {memory} MiB in {region}")
             data.extend([
-                std.value( od["name"]),
-                curr.value( od["od"]),
-                std.value( cud["name"]),
-                curr.value( cud["cud1y"]),
-                std.value( cud["name"]),
-                curr.value( cud["cud3y"]),
-                curr.value( os_price),
-                curr.value( price_list.select_disk_price("standard", region)*disk),
-                curr.value( price_list.select_disk_price("balanced", region)*disk),
-                curr.value( price_list.select_disk_price("ssd", region)*disk),
+                od["name"],
+                od["od"],
+                cud["name"],
+                cud["cud1y"],
+                cud["name"],
+                cud["cud3y"],
+                os_price,
+                price_list.select_disk_price("standard", region)*disk,
+                price_list.select_disk_price("balanced", region)*disk,
+                price_list.select_disk_price("ssd", region)*disk,
             ])
-        sheet.append(data)
         return data
 
+# rows that failed by stage, kept for the workers to report them to the
+# parent, which exports them
+failed_rows = {"read": 0, "price": 0}
+
+def count_failed(stage):
+    failed_rows[stage] += 1
+    telemetry.count("rows.failed", stage=stage)
+
+def priced_rows(vms, regions, quotes, report_errors=True):
+    for vm_index, (row_index, vm) in enumerate(vms):
+        try:
+            yield row_index, vm_row(vm, regions, {key: region_quotes[vm_index] for key, region_quotes in quotes.items()})
+        except Exception as e:
+            count_failed("price")
+            if report_errors:
+                print("error processing row %s: %s" % (row_index, traceback.format_exc()))
+
+def row_formats(sheet):
+    formats = {}
+    for color in ['EEEEEE', None]:
+        formats[color] = (
+            CellFormat(sheet).color(color),
+            CellFormat(sheet).color(color).currency(),
+            CellFormat(sheet).color(color).gb()
+        )
+    return formats
+
+def process_row(sheet, row_index, data, formats=None):
+        color = 'EEEEEE' if not (row_index % 2) else None
+
+        if formats is None:
+            formats = row_formats(sheet)
+        std, curr, gb = formats[color]
+
+        row = []
+        for index, value in enumerate(data, 1):
+            if index in [3, 4]:
+                row.append(gb.value(value))
+            elif is_currency(index):
+                row.append(curr.value(value))
+            else:
+                row.append(std.value(value))
+        sheet.append(row)
+        return row
+
 initial_row_offset=3
 region_spacer=3
 
@@ -163,16 +234,19 @@ def is_currency(index):
 
     return False
 
-def fit_sheet_columns(sheet):
-    for index, column in enumerate(sheet.iter_cols(), 1):
+def fit_sheet_columns(sheet, widths=None):
+    if widths is None:
+        widths = ColumnWidths()
+        for row in sheet.iter_rows(values_only=True):
+            widths.update(row)
+    for index in range(1, widths.max_column + 1):
         label = openpyxl.utils.get_column_letter(index)
         if index in [2,3,4] or is_currency(index) :
             sheet.column_dimensions[label].width= 10
         # elif is_currency(index):
         #     sheet.column_dimensions[label].width= 8
         else:
-            length = max(len(str(cell.value))  for cell in column)
-            sheet.column_dimensions[label].width = length
+            sheet.column_dimensions[label].width = widths.get(index)
 
 def fit_summary_columns(sheet):
     sheet.column_dimensions['A'].width=30
@@ -222,23 +296,31 @@ def add_region_header(sheet, region_index, region_name):
 def get_region_color(region_index):
     return  ['DEE7E5', 'DEDCE6', 'F6F9D4'][region_index % 3]
 
-def add_book_info(sheet, book_index, book_name, region_index, region_name, regions_qtty, books_qtty):
+# hosts the book needs on GCVE, as the ROUNDUP formula of the GCVE table
+def get_gcve_hosts(book):
+    totals = book["totals"]
+    return math.ceil(max(totals.get(2)/72, totals.get(3)/1024/768, totals.get(4)/1024/19.2))
+
+# what the Summary formulas of a book add up to, per commit: the SSD,
+# Balanced and Standard totals and the GCVE one (None without a GCVE price)
+def get_book_values(book, region_index, region_name):
+    gcve_price = price_list.get_gcve_price(region_name)
+    start_colum = 6 + (region_index*10)
+    totals = book["totals"]
+    values = {}
+    for commit in [1,3,5]:
+        values[commit] = [
+            totals.get(start_colum+commit) + totals.get(start_colum+6) + totals.get(start_colum+disk)
+            for disk in [9,8,7]
+        ]
+        values[commit].append(None if gcve_price is None else get_gcve_hosts(book)*gcve_price[commits_column[commit]])
+    return values
+
+def add_book_info(sheet, book_index, book_name, region_index, region_name, regions_qtty, books_qtty, book, values=None):
     gcve_price = price_list.get_gcve_price(region_name)
     if gcve_price is None:
         gcve_price = {"od": "NA()", "cud1y": "NA()", "cud3y":"NA()"}
 
-    commits_name={
-        1: "OD",
-        3: "1Y",
-        5: "3Y"
-    }
-
-    commits_column={
-        1: "od",
-        3: "cud1y",
-        5: "cud3y"
-    }
-
     start_colum = 6 + (region_index*10)
     gcve_offset = get_gcve_offset(regions_qtty, books_qtty) +  book_index
 
@@ -247,13 +329,19 @@ def add_book_info(sheet, book_index, book_name, region_index, region_name, regio
     for row_index, commit in enumerate([1,3,5]):
         format = CellFormat(sheet).color(commit_colors[commits_name[commit]]).currency()
         summary_row = [header.value(book_name), format.value(commits_name[commit])]
+        if not values is None:
+            summary_row.extend([format.value("=NA()" if value is None else value) for value in values[commit]])
+            sheet.append(summary_row)
+            continue
         for disk in [9,8,7]:
             summary_row.append(
-            format.value("=SUM('{path}'!{commit}:{commit}, '{path}'!{os}:{os}, '{path}'!{disk}:{disk})".format(
+            format.value("=SUM('{path}'!{commit}{first}:{commit}{last}, '{path}'!{os}{first}:{os}{last}, '{path}'!{disk}{first}:{disk}{last})".format(
                 path=book_name,
                 commit=openpyxl.utils.get_column_letter(start_colum+commit),
                 os=openpyxl.utils.get_column_letter(start_colum+6),
                 disk=openpyxl.utils.get_column_letter(start_colum+disk),
+                first=book["first_row"],
+                last=book["last_row"]
             )))
         summary_row.append(
             format.value('''=E{gcve_offset}*{price}'''.format(gcve_offset=gcve_offset, price=gcve_price[commits_column[commit]]))
@@ -262,20 +350,23 @@ def add_book_info(sheet, book_index, book_name, region_index, region_name, regio
     sheet.merge_cells(start_row=first_row, start_column=1, end_row=sheet.max_row, end_column=1)
 
 
-def add_region_footer(sheet, books_qtty, region_index):
+def add_region_footer(sheet, books_qtty, region_index, values=None):
     if books_qtty > 1:
 
         last_sum_row = sheet.max_row
         first_sum_row = last_sum_row - 5
         header = CellFormat(sheet).header(get_region_color(region_index))
 
-        for row_offset, commit in enumerate(['OD', '1Y', '3Y']):
+        for offset, commit in commits_name.items():
             format = CellFormat(sheet).color(commit_colors[commit]).currency()
             summary_row = [header.value('TOTAL'), format.value(commit)]
-            for column in ['C', 'D', 'E', 'F']:
-                summary_row.append(
-                    format.value('''=SUMPRODUCT((B{first}:B{last}="{commit}")*({column}{first}:{column}{last}))'''.format(first=first_sum_row, last=last_sum_row, commit=commit, column=column)),
-                )
+            if not values is None:
+                summary_row.extend([format.value("=NA()" if value is None else value) for value in values[offset]])
+            else:
+                for column in ['C', 'D', 'E', 'F']:
+                    summary_row.append(
+                        format.value('''=SUMPRODUCT((B{first}:B{last}="{commit}")*({column}{first}:{column}{last}))'''.format(first=first_sum_row, last=last_sum_row, commit=commit, column=column)),
+                    )
             sheet.append(summary_row)
             sheet.merge_cells(start_row=last_sum_row+1, start_column=1, end_row=last_sum_row+3, end_column=1)
 
@@ -298,19 +389,39 @@ def add_gcve_header(sheet):
             .generator(['Input file', 'vCPUS', 'Memory', 'Disk', 'Hosts'])
     )
 
-def add_gcve_info(sheet, book_name):
+def add_gcve_info(sheet, book_name, book, totals="formulas"):
     tb = CellFormat(sheet).tb()
+    if totals == "values":
+        sheet.append([
+            CellFormat(sheet).center().value(book_name),
+            book["totals"].get(2),
+            tb.value(book["totals"].get(3)/1024),
+            tb.value(book["totals"].get(4)/1024),
+            get_gcve_hosts(book)
+        ])
+        return
     data = [
         CellFormat(sheet).center().value(book_name),
-        "=SUM('{path}'!B:B)".format(path=book_name),
-        tb.value("=SUM('{path}'!C:C)/1024".format(path=book_name)),
-        tb.value("=SUM('{path}'!D:D)/1024".format(path=book_name)),
+        "=SUM('{path}'!B{first}:B{last})".format(path=book_name, first=book["first_row"], last=book["last_row"]),
+        tb.value("=SUM('{path}'!C{first}:C{last})/1024".format(path=book_name, first=book["first_row"], last=book["last_row"])),
+        tb.value("=SUM('{path}'!D{first}:D{last})/1024".format(path=book_name, first=book["first_row"], last=book["last_row"])),
         '=ROUNDUP(max(B{row}/72,C{row}/768,D{row}/(19.2)))'.format(row=sheet.max_row + 1)
     ]
     sheet.append(data)
 
-def add_gcve_footer(sheet, books_qtty):
-    if books_qtty > 1:
+def add_gcve_footer(sheet, books_qtty, books=None):
+    if books_qtty > 1 and not books is None:
+        bold = CellFormat(sheet).bold().color('FFDBB6')
+        tb = CellFormat(sheet).bold().tb().color('FFDBB6')
+        center = CellFormat(sheet).bold().color('FFDBB6').center()
+        sheet.append([
+            center.value('TOTAL'),
+            bold.value(sum(book["totals"].get(2) for book in books)),
+            tb.value(sum(book["totals"].get(3) for book in books)/1024),
+            tb.value(sum(book["totals"].get(4) for book in books)/1024),
+            bold.value(sum(get_gcve_hosts(book) for book in books))
+        ])
+    elif books_qtty > 1:
         last_sum_row = sheet.max_row
         first_sum_row = last_sum_row - books_qtty
         bold = CellFormat(sheet).bold().color('FFDBB6')
@@ -325,6 +436,62 @@ def add_gcve_footer(sheet, books_qtty):
             bold.value('''=SUM(E{first}:E{last})'''.format(first=first_sum_row, last=last_sum_row))
         ])
 
+# the vCPU, memory and disk of the vms of a book, all the packing keeps of its rows
+def fleet_vms(rows):
+    return np.array([data[1:4] for row_index, data in rows], dtype=float).reshape(-1, 3)
+
+# packs the vms of every book together on each node type
+def pack_fleet(fleet, nodes, overcommit):
+    vms = np.concatenate(fleet) if len(fleet) > 0 else np.zeros((0, 3))
+    packings = []
+    for node_type in nodes:
+        packing = Packing(node_type, *overcommit).pack(vms)
+        utilization = packing.utilization().mean(axis=0) if packing.nodes > 0 else np.zeros(3)
+        print("%s: %s nodes, %.1f%% vCPU, %.1f%% memory, %.1f%% disk used%s" % (
+            node_type, packing.nodes, *(utilization*100),
+            "" if packing.unplaced == 0 else ", %s vms too large for a node" % packing.unplaced
+        ))
+        packings.append(packing)
+    return packings
+
+def add_packing_info(sheet, packings, overcommit):
+    sheet.append([])
+    sheet.append(
+        CellFormat(sheet)
+            .header('D9E1F2')
+            .generator([
+                'NODES (vCPU overcommit %s, memory overcommit %s)' % overcommit
+            ])
+    )
+    sheet.merge_cells(start_row=sheet.max_row, start_column=1, end_row=sheet.max_row, end_column=7)
+    sheet.append(
+        CellFormat(sheet)
+            .header('D9E1F2')
+            .generator(['Node type', 'Nodes', 'VMs', 'Too large', 'vCPU', 'Memory', 'Disk'])
+    )
+    center = CellFormat(sheet).center()
+    percent = CellFormat(sheet).percent()
+    for packing in packings:
+        utilization = packing.utilization().mean(axis=0) if packing.nodes > 0 else np.zeros(3)
+        sheet.append([
+            center.value(packing.node_type),
+            packing.nodes,
+            int(packing.vms.sum()),
+            packing.unplaced,
+            *[percent.value(float(value)) for value in utilization]
+        ])
+
+# one row per node with the vms it hosts and the share of its capacity they use
+def process_nodes(output, packings, streaming=False):
+    sheet = output.create_sheet("Nodes")
+    if not streaming:
+        sheet.column_dimensions['A'].width = 20
+    sheet.append(CellFormat(sheet).header().generator(['Node type', 'Node', 'VMs', 'vCPU', 'Memory', 'Disk']))
+    percent = CellFormat(sheet).percent()
+    for packing in packings:
+        for node, (vms, utilization) in enumerate(zip(packing.vms.tolist(), packing.utilization().tolist()), 1):
+            sheet.append([packing.node_type, node, vms, *[percent.value(value) for value in utilization]])
+
 def add_summary_disclaimers(sheet, disclaimers):
     for disclaimer in disclaimers:
         sheet.append([disclaimer])
@@ -332,92 +499,290 @@ def add_summary_disclaimers(sheet, disclaimers):
     sheet.append([])
     initial_row_offset = len(disclaimers) + 1
 
-def process_file(book_name, output, regions, regions_qtty, optimization):
-        book = openpyxl.load_workbook(book_name, read_only=True, data_only=True)
-        columns = {}
-        sheet = output.create_sheet(os.path.basename(book_name))
-        write_book_header(sheet, regions, regions_qtty)
-        input_sheet = book['vInfo']
-        for row_index, row in enumerate(tqdm(input_sheet.iter_rows(values_only=True), desc=book_name, total=input_sheet.max_row)):
+def read_book(book_name, optimization, progress=True):
+        reader = open_vinfo(book_name, required_columns)
+        if not reader.has_sheet:
+            reader.close()
+            return ["Sheet vInfo not found on %s" % book_name], []
+        columns = {column: index for index, column in enumerate(required_columns)}
+        vms = []
+        rows = reader.rows()
+        if progress:
+            rows = tqdm(rows, desc=book_name, total=reader.max_row)
+        for row_index, row in rows:
             if (row_index == 0): #header
-                for index, column in enumerate(row):
-                    columns[column] = index
+                continue
             elif row[columns['VM']] is None:
-                return
+                break
             else:
                 try:
-                    process_row(sheet, row_index, row, regions, columns, optimization)
+                    vms.append((row_index, read_vm(row, columns, optimization)))
                 except Exception as e:
+                    count_failed("read")
                     print("error processing row %s: %s" % (row_index, traceback.format_exc()))
-        fit_sheet_columns(sheet)
+        reader.close()
+        missing = set(required_columns) - set(reader.header or [])
+        if len(missing) > 0:
+            return ["Columns %s not found on vInfo of %s" % (', '.join(sorted(missing)), book_name)], []
+        return [], vms
+
+# opens, validates and prices a whole book; runs on the worker processes when --jobs > 1
+def load_book(book_name, regions, optimization, progress=True):
+    with telemetry.span("load_book", book=os.path.basename(book_name)):
+        errors, vms = read_book(book_name, optimization, progress)
+        if len(errors) > 0:
+            return errors, []
+
+        # price every vm of the sheet in one vectorized pass per region and commit
+        quotes = price_vms([vm for row_index, vm in vms], regions)
+        return [], list(priced_rows(vms, regions, quotes))
+
+def init_worker(prices):
+    global price_list
+    price_list = prices
+
+# os strings the workers classified, their caches are not the parent's
+worker_os = {"hits": 0, "misses": 0}
+
+def load_book_worker(book_name, regions, optimization):
+    batch_quotes = dict(price_list.batch_quotes)
+    os_info = classify_os.cache_info()
+    failed = dict(failed_rows)
+    errors, rows = load_book(book_name, regions, optimization, False)
+    os_counts = (classify_os.cache_info().hits - os_info.hits, classify_os.cache_info().misses - os_info.misses)
+    failed = {stage: failed_rows[stage] - failed[stage] for stage in failed_rows}
+    batch_quotes = {key: price_list.batch_quotes[key] - value for key, value in batch_quotes.items()}
+    return errors, rows, batch_quotes, os_counts, failed
+
+# yields the errors and rows of each book in order, loading the next one
+# only once it is asked for; with --jobs the workers load at most one book
+# each ahead of the book being written
+def load_books(books, regions, optimization, jobs=1):
+    if jobs <= 1:
+        for book_name in books:
+            yield (book_name, *load_book(book_name, regions, optimization))
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(price_list,)) as pool:
+        remaining = iter(books)
+        pending = deque()
+        def submit():
+            book_name = next(remaining, None)
+            if not book_name is None:
+                pending.append((book_name, pool.submit(load_book_worker, book_name, regions, optimization)))
+        for worker in range(jobs):
+            submit()
+        progress = tqdm(desc="books", total=len(books))
+        while len(pending) > 0:
+            book_name, future = pending.popleft()
+            with telemetry.span("wait_book", book=os.path.basename(book_name)):
+                errors, rows, batch_quotes, (os_hits, os_misses), failed = future.result()
+            # the finished future would keep the rows alive until the next book
+            future = None
+            submit()
+            progress.update()
+            for key, value in batch_quotes.items():
+                price_list.batch_quotes[key] += value
+            worker_os["hits"] += os_hits
+            worker_os["misses"] += os_misses
+            # the workers export nothing, their failed rows are counted here
+            for stage, count in failed.items():
+                if count > 0:
+                    telemetry.count("rows.failed", count, stage=stage)
+            yield book_name, errors, rows
+        progress.close()
+
+def process_file(book_name, rows, output, regions, regions_qtty, streaming=False):
+    with telemetry.span("process_file", book=os.path.basename(book_name), rows=len(rows)) as span:
+        started = perf_counter()
+        book = write_book(book_name, rows, output, regions, regions_qtty, streaming)
+        elapsed = perf_counter() - started
+        span.set_attribute("rows_per_second", len(rows) / elapsed if elapsed > 0 else 0)
+        telemetry.count("rows.processed", len(rows))
+        return book
+
+def write_book(book_name, rows, output, regions, regions_qtty, streaming=False):
+        sheet = output.create_sheet(os.path.basename(book_name))
+        if streaming:
+            sheet = StreamingSheet(sheet)
+        write_book_header(sheet, regions, regions_qtty)
+
+        if streaming:
+            # a streamed sheet needs its column widths before the first row is written
+            widths = ColumnWidths()
+            for row_index, row in sheet.pending:
+                widths.update(row)
+            for row_index, data in rows:
+                widths.update(data)
+            fit_sheet_columns(sheet, widths)
+
+        # totals are summed as the rows are written, for the Summary and the console
+        book = {"first_row": sheet.max_row + 1, "totals": ColumnTotals()}
+        formats = row_formats(sheet)
+        for row_index, data in rows:
+            book["totals"].update(data)
+            process_row(sheet, row_index, data, formats)
+        book["last_row"] = sheet.max_row
+
+        if streaming:
+            sheet.flush()
+        else:
+            fit_sheet_columns(sheet)
+        return book
+
+# totals of every book per commit, as the TOTAL rows of a region add them up
+def get_region_values(books_values):
+    values = {}
+    for commit in [1,3,5]:
+        columns = zip(*[book_values[commit] for book_values in books_values])
+        values[commit] = [None if None in column else sum(column) for column in columns]
+    return values
+
+def print_totals(regions, books):
+    for region_index, region_name in enumerate(regions):
+        values = get_region_values([get_book_values(book, region_index, region_name) for book in books])
+        for commit in [1,3,5]:
+            print("%s %s: %s" % (region_name, commits_name[commit], ", ".join(
+                "%s %s" % (name, "NA" if value is None else "%.2f" % value)
+                for name, value in zip(['SSD', 'Balanced', 'Standard', 'GCVE'], values[commit])
+            )))
 
-def create_summary(summary, regions, regions_qtty, books, books_qtty):
+# totals are either bounded formulas over the book sheets or the values
+# summed while the sheets were written, which open without a recalculation
+def create_summary(summary, regions, regions_qtty, books, books_qtty, packings=None, overcommit=(1, 1), book_totals=None, totals="formulas"):
+    fit_summary_columns(summary)
     add_summary_disclaimers(summary, ['*** on-demand prices includes sustained use discounts ***'])
     # add a summarization table per region to the Summary sheet
     for region_index, region_name in enumerate(regions):
         add_region_header(summary, region_index, region_name)
+        books_values = None
+        if totals == "values":
+            books_values = [get_book_values(book, region_index, region_name) for book in book_totals]
         for book_index, book_name in enumerate(books):
-            add_book_info(summary, book_index, os.path.basename(book_name), region_index, region_name, regions_qtty, books_qtty)
-        add_region_footer(summary, books_qtty, region_index)
+            add_book_info(summary, book_index, os.path.basename(book_name), region_index, region_name, regions_qtty, books_qtty,
+                book_totals[book_index], None if books_values is None else books_values[book_index])
+        add_region_footer(summary, books_qtty, region_index, None if books_values is None else get_region_values(books_values))
 
     # add the gcve table to the Summary sheet
     add_gcve_header(summary)
-    for book_name in books:
-        add_gcve_info(summary, os.path.basename(book_name))
-    add_gcve_footer(summary, books_qtty)
-    fit_summary_columns(summary)    
-
-def process_files(books, regions, optimization):
+    for book_name, book in zip(books, book_totals):
+        add_gcve_info(summary, os.path.basename(book_name), book, totals)
+    add_gcve_footer(summary, books_qtty, book_totals if totals == "values" else None)
+
+    if not packings is None:
+        add_packing_info(summary, packings, overcommit)
+
+# json, json lines or csv records of every vm of a book, written without
+# building a workbook
+def process_records(writer, book_name, rows, regions):
+    with telemetry.span("process_records", book=os.path.basename(book_name), rows=len(rows)):
+        book = {"totals": ColumnTotals()}
+        for row_index, data in rows:
+            book["totals"].update(data)
+            for record in vm_records(os.path.basename(book_name), row_index, data, regions):
+                writer.write(record)
+        telemetry.count("rows.processed", len(rows))
+        return book
+
+def write_total_records(writer, regions, book_totals):
+    for region_index, region_name in enumerate(regions):
+        values = get_region_values([get_book_values(book, region_index, region_name) for book in book_totals])
+        for commit in [1,3,5]:
+            writer.write(total_record(region_name, commits_name[commit], *values[commit]))
+
+# quotes reused across the vms of a batch and os strings classified once
+def count_quotes():
+    telemetry.count("quotes.priced", price_list.batch_quotes["priced"])
+    telemetry.count("quotes.reused", price_list.batch_quotes["reused"])
+    os_info = classify_os.cache_info()
+    telemetry.count("os.hits", os_info.hits + worker_os["hits"])
+    telemetry.count("os.misses", os_info.misses + worker_os["misses"])
+
+def process_files(books, regions, optimization, streaming=False, jobs=1, nodes=None, overcommit=(1, 1), totals="formulas", format="xlsx"):
     books_qtty= len(books)
     regions_qtty= len(regions)
-    output = openpyxl.Workbook()
-    summary = output.active
-    summary.title="Summary"
-
-    # write one sheet per rvtools book to the target workbook
-    for book_name in books:
-        process_file(book_name, output, regions, regions_qtty, optimization)
+    filename = 'estimated-rvtools-%s.%s' % (datetime.now().strftime("%Y%m%d-%H%M%S"), format)
+    if format != "xlsx":
+        print("writing %s..." % filename)
+        writer = RecordWriter(filename, format)
+    else:
+        output = openpyxl.Workbook(write_only=streaming)
+        if streaming:
+            summary = StreamingSheet(output.create_sheet("Summary"))
+        else:
+            summary = output.active
+            summary.title="Summary"
+
+    # books are read, priced and written one at a time and their rows dropped
+    # once written, so only the rows of the current book are held (and with
+    # --jobs those of the books the workers loaded ahead), along with the
+    # totals of every book and, to pack the fleet, the size of every vm;
+    # with --jobs the spans of each book stay in the worker processes
+    errors = []
+    book_totals = []
+    fleet = []
+    completed = False
+    try:
+        for book_name, book_errors, rows in load_books(books, regions, optimization, jobs):
+            errors.extend(book_errors)
+            # the remaining books are still read to report all their errors
+            if len(errors) > 0:
+                continue
+            if not nodes is None:
+                fleet.append(fleet_vms(rows))
+            if format != "xlsx":
+                book_totals.append(process_records(writer, book_name, rows, regions))
+            else:
+                book_totals.append(process_file(book_name, rows, output, regions, regions_qtty, streaming))
+            rows = None
+        completed = len(errors) == 0
+    finally:
+        # records of a failed estimate are not left behind
+        if not completed and format != "xlsx":
+            writer.close()
+            os.remove(filename)
+    if len(errors) > 0:
+        print(*errors, sep="\n")
+        sys.exit(127)
 
-    create_summary(summary, regions, regions_qtty, books, books_qtty)
+    # an empty list of node types packs on all of them
+    packings = None
+    if not nodes is None:
+        with telemetry.span("pack_fleet"):
+            packings = pack_fleet(fleet, nodes or list(node_types), overcommit)
+
+    if format != "xlsx":
+        write_total_records(writer, regions, book_totals)
+        writer.close()
+        print("...done.")
+        print_totals(regions, book_totals)
+        count_quotes()
+        print(price_list.quote_stats())
+        return
+
+    with telemetry.span("create_summary", totals=totals):
+        create_summary(summary, regions, regions_qtty, books, books_qtty, packings, overcommit, book_totals, totals)
+        if streaming:
+            summary.flush()
+
+    if not packings is None:
+        process_nodes(output, packings, streaming)
 
     print("saving output file...")
-    output.save(
-        filename = 'estimated-rvtools-%s.xlsx' % datetime.now().strftime("%Y%m%d-%H%M%S")
-    )
+    with telemetry.span("save", streaming=streaming):
+        output.save(filename = filename)
     print("...done.")
     output.close()
-
-def validate_books(books):
-    errors = []
-    for book_name in books:
-        book = openpyxl.load_workbook(book_name, read_only=True, data_only=True)
-        if not 'vInfo' in book.sheetnames:
-            errors.append("Sheet vInfo not found on %s" % book_name)
-            continue
-        # cols = list(book['vInfo'].iter_cols(min_row=1, max_row=1, values_only=True))
-        required_cols = {
-            'VM',
-            'CPUs',
-            'Memory',
-            'Unshared MB',
-            'OS according to the configuration file',
-            'OS according to the VMware Tools'            
-        }
-        cols = [set(r) for r in book['vInfo'].iter_rows(min_row=1, max_row=1, values_only=True)][0]
-        missing = required_cols - cols
-        if len(missing) > 0:
-            print("##################")
-            print (missing)
-            print("##################")
-            sys.exit()
-
-    if len(errors) > 0:
-        print(*errors)
-        sys.exit(127)
-
+    print_totals(regions, book_totals)
+    count_quotes()
+    print(price_list.quote_stats())
 
 if (__name__=="__main__"):
     args = parse_args(require_sheet=True)
-    validate_books(args.sheets)
-    price_list = PriceList(args.regions, args.period, args.nocache, args.local)
-    process_files(args.sheets, args.regions, (1 - (args.optimization/100)))
\ No newline at end of file
+    telemetry.configure(args.telemetry, "estimate_rvtools")
+    profiler = None if args.profile is None else Profiler().start()
+    try:
+        price_list = PriceList(args.regions, args.period, args.nocache, args.local)
+        process_files(args.sheets, args.regions, (1 - (args.optimization/100)), args.streaming, args.jobs, args.nodes, (args.cpu_overcommit, args.memory_overcommit), args.totals, args.format)
+    finally:
+        if not profiler is None:
+            profiler.stop().write(args.profile)
@@ -3,6 +3,7 @@
 
 
 from pricing import PriceList, parse_args
+import telemetry
 from consolemenu import *
 from consolemenu.items import *
 from consolemenu.prompt_utils import PromptUtils, InputResult
@@ -64,25 +65,26 @@ def build_menu():
     menu.append_item(region_item)
 
     menu.append_item(
-        FunctionItem("List pre-defined types", print_list, args=[price_list.lists['predefined']])
+        FunctionItem("List pre-defined types", print_list, args=[price_list.listing('predefined')])
     )
     menu.append_item(
-        FunctionItem("List customizable families", print_list, args=[price_list.lists['custom']])
+        FunctionItem("List customizable families", print_list, args=[price_list.listing('custom')])
     )
     menu.append_item(
-        FunctionItem("List unit price for pre-defined types", print_list, args=[price_list.lists['standard']])   
+        FunctionItem("List unit price for pre-defined types", print_list, args=[price_list.listing('standard')])   
     )
     menu.append_item(
-        FunctionItem("List disk prices", print_list, args=[price_list.lists['disk']])
+        FunctionItem("List disk prices", print_list, args=[price_list.listing('disk')])
     )
     menu.append_item(
-        FunctionItem("List O.S. prices", print_list, args=[[price_list.lists['images']]])
+        FunctionItem("List O.S. prices", print_list, args=[price_list.listing('images')])
     )
     return menu
 
 
 if (__name__=="__main__"):
     args = parse_args()
+    telemetry.configure(args.telemetry, "menu")
     price_list = PriceList(args.regions, args.period, args.nocache, args.local)
     menu = build_menu()
     utils = PromptUtils(menu.screen)
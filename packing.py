@@ -0,0 +1,101 @@
+import numpy as np
+
+# capacity of each node type in vCPUs, GB of memory and GB of disk; disks of
+# sole-tenant VMs are persistent disks, not node storage, so they are not packed
+node_types = {
+    've1-standard-72':  {"cpus": 72,  "memory": 768,    "disk": 19.2*1024},
+    'n1-node-96-624':   {"cpus": 96,  "memory": 624,    "disk": None},
+    'n2-node-80-640':   {"cpus": 80,  "memory": 640,    "disk": None},
+    'n2d-node-224-896': {"cpus": 224, "memory": 896,    "disk": None},
+    'c2-node-60-240':   {"cpus": 60,  "memory": 240,    "disk": None},
+    'm1-node-96-1433':  {"cpus": 96,  "memory": 1433.6, "disk": None},
+}
+
+
+class Packing:
+    def __init__(self, node_type:str, cpu_overcommit:float=1, memory_overcommit:float=1) -> None:
+        node = node_types[node_type]
+        self.node_type = node_type
+        self.capacity = np.array([
+            node["cpus"] * cpu_overcommit,
+            node["memory"] * memory_overcommit,
+            np.inf if node["disk"] is None else node["disk"]
+        ], dtype=float)
+        self.used = np.zeros((0, 3))
+        self.vms = np.zeros(0, dtype=np.int64)
+        self.unplaced = 0
+
+    @property
+    def nodes(self) -> int:
+        return len(self.used)
+
+    # used share of each node's capacity, disks being 0 where they are not packed
+    def utilization(self) -> np.ndarray:
+        capacity = np.where(np.isinf(self.capacity), np.nan, self.capacity)
+        return np.nan_to_num(self.used / capacity)
+
+    # First-fit decreasing over (vCPU, GB, disk GB) vectors, largest share of
+    # a node first. Identical vms are placed together: first-fit fills the
+    # first node with room until it is full, so each distinct size is a
+    # single vectorized step over the open nodes. Nodes without room for the
+    # smallest size still to come are left out of those steps, and disks are
+    # rounded up to whole GB to keep the distinct sizes few.
+    def pack(self, vms:np.ndarray) -> "Packing":
+        vms = np.asarray(vms, dtype=float).reshape(-1, 3).copy()
+        vms[:, 2] = np.ceil(vms[:, 2])
+        sizes, counts = np.unique(vms, axis=0, return_counts=True)
+        order = np.argsort(-(sizes / self.capacity).max(axis=1), kind="stable")
+        sizes, counts = sizes[order], counts[order]
+        # smallest demand in each dimension from each size on
+        smallest = np.vstack([
+            np.minimum.accumulate(sizes[::-1], axis=0)[::-1],
+            np.full((1, 3), np.inf)
+        ])
+
+        demands = np.where(sizes > 0, sizes, np.nan)
+        too_big = np.any(sizes > self.capacity, axis=1)
+        # how many of each size an empty node takes
+        per_node = self.fits(self.capacity[None, :], demands)
+
+        # at most one node per vm is ever opened
+        opened = self.nodes
+        used = np.vstack([self.used, np.zeros((len(vms), 3))])
+        placed = np.concatenate([self.vms, np.zeros(len(vms), dtype=np.int64)])
+        active = np.arange(opened)
+        for index, (size, count) in enumerate(zip(sizes, counts.tolist())):
+            if too_big[index]:
+                self.unplaced += count
+                continue
+            demand = demands[index]
+            if len(active) > 0:
+                # how many more of this size each open node takes
+                room = np.minimum(self.fits(self.capacity - used[active], demand), count)
+                taken = np.minimum(room, np.maximum(count - (np.cumsum(room) - room), 0)).astype(np.int64)
+                used[active] += taken[:, None] * size
+                placed[active] += taken
+                count -= int(taken.sum())
+
+            if count > 0:
+                size_per_node = int(min(per_node[index], count))
+                full, rest = divmod(count, size_per_node)
+                new = np.full(full + (rest > 0), size_per_node, dtype=np.int64)
+                if rest > 0:
+                    new[-1] = rest
+                used[opened:opened + len(new)] = new[:, None] * size
+                placed[opened:opened + len(new)] = new
+                active = np.concatenate([active, np.arange(opened, opened + len(new))])
+                opened += len(new)
+
+            active = active[np.all(self.capacity - used[active] + 1e-9 >= smallest[index + 1], axis=1)]
+
+        self.used = used[:opened]
+        self.vms = placed[:opened]
+        return self
+
+    # vms of a size fitting in each row of free capacity, a tiny tolerance
+    # absorbing the float error of the running sums
+    @staticmethod
+    def fits(free:np.ndarray, demand:np.ndarray) -> np.ndarray:
+        fits = np.floor(free / demand + 1e-9)
+        fits = np.where(np.isnan(fits), np.inf, fits).min(axis=1)
+        return np.maximum(fits, 0)
@@ -2,9 +2,15 @@
 "exec" "$(dirname $0)/env/bin/python3" "$0" "$@"
 
 from pricing import PriceList, parse_args
+from profiler import Profiler
+import telemetry
 
 if (__name__=="__main__"):
     args = parse_args()
+    telemetry.configure(args.telemetry, "price_loader")
+    profiler = None if args.profile is None else Profiler().start()
     price_list = PriceList(args.regions, args.period, args.nocache, args.local)
     print(price_list.count())    
+    if not profiler is None:
+        profiler.stop().write(args.profile)
     pass
\ No newline at end of file
@@ -1,20 +1,56 @@
 import argparse
-from pricing.base_table import BaseTable
-from pricing.predefined_table import PredefinedTable
-from pricing.disk_table import DiskTable
-from pricing.generic_table import GenericTable
-from pricing.table_factory import TableFactory
-from pricing.gcve_frame import GCVEFrame
-from pricing.licenses_text import Licenses
+import importlib
+from pricing.quote_cache import QuoteCache
+from pricing.price_cache import PriceCache, StaleCacheError
+from pricing.document_store import DocumentStore
+from pricing.shape_index import PredefinedIndex, CustomIndex, priced
 from pricing.price_list import PriceList
 
-def parse_args(require_sheet=False):
+# the parsers of the pricing documents (and bs4 with them) are only needed
+# when prices are not in the cache, so they are imported on first use
+lazy_names = {
+    'BaseTable': 'pricing.base_table',
+    'PredefinedTable': 'pricing.predefined_table',
+    'DiskTable': 'pricing.disk_table',
+    'GenericTable': 'pricing.generic_table',
+    'TableFactory': 'pricing.table_factory',
+    'GCVEFrame': 'pricing.gcve_frame',
+    'Licenses': 'pricing.licenses_text',
+    'PricingPage': 'pricing.pricing_page',
+}
+
+def __getattr__(name):
+    if not name in lazy_names:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(lazy_names[name]), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(lazy_names))
+
+def parse_args(require_sheet=False, serve=False):
     parser = argparse.ArgumentParser()
     parser.add_argument("-r", "--regions", nargs='*', help="region to be loaded", required=True)
     parser.add_argument("-p", "--period", nargs='?', help="regions to be loaded", default="monthly" , choices=['monthly', 'hourly'])
-    parser.add_argument("-nc", "--nocache", action='store_true', help="ignore cache")
-    parser.add_argument("-l", "--local", action='store_true', help="use local html")
+    parser.add_argument("-nc", "--nocache", action='store_true', help="ignore the cache and revalidate the stored pricing documents")
+    parser.add_argument("-tm", "--telemetry", nargs='?', const='console', default=None, help="export spans and counters to console, gcp, jaeger or a file (default: console)")
+    parser.add_argument("-pf", "--profile", nargs='?', const='profile', default=None, help="sample the run and write <profile>.folded stacks and a <profile>.txt summary (default: profile)")
+    parser.add_argument("-l", "--local", nargs='?', const='html', default=None, help="read the pricing documents from a local directory (default: html)")
     if (require_sheet):
+        from packing import node_types
         parser.add_argument("-s", "--sheets", nargs='*', help="RVTools Spreadsheet", required=True)
         parser.add_argument("-o", "--optimization", nargs='?', type=int, choices=range(1,51),  default=0, help="cpu optimization %%", required=False)
+        parser.add_argument("-j", "--jobs", type=int, default=1, help="input workbooks parsed and priced in parallel")
+        parser.add_argument("-st", "--streaming", action='store_true', help="stream the output workbook to keep memory flat")
+        parser.add_argument("-f", "--format", default="xlsx", choices=['xlsx', 'json', 'jsonl', 'csv'], help="output format, all but xlsx skip the workbook and write one record per vm and region")
+        parser.add_argument("-t", "--totals", default="formulas", choices=['formulas', 'values'], help="write the Summary totals as bounded formulas or as precomputed values")
+        parser.add_argument("-n", "--nodes", nargs='*', choices=list(node_types), default=None, help="node types the vms are bin-packed on (all when none is given)")
+        parser.add_argument("-co", "--cpu-overcommit", type=float, default=1.0, help="vCPU overcommit ratio of the packed nodes")
+        parser.add_argument("-mo", "--memory-overcommit", type=float, default=1.0, help="memory overcommit ratio of the packed nodes")
+    if (serve):
+        parser.add_argument("-H", "--host", default="127.0.0.1", help="address the quote api listens on")
+        parser.add_argument("-P", "--port", type=int, default=8080, help="port the quote api listens on")
+        parser.add_argument("-u", "--socket", default=None, help="listen on this unix socket instead of a port")
+        parser.add_argument("-rf", "--refresh", type=float, default=360, help="minutes between price refreshes, 0 never refreshes")
     return parser.parse_args()
\ No newline at end of file
@@ -18,12 +18,12 @@ cpu_ratio= {
 }
 
 class BaseTable (GenericTable) :
-    def __init__(self, rows, family_name, period, kind) -> None:
-        super().__init__(rows, family_name, period)
+    def __init__(self, rows, family_name, kind) -> None:
+        super().__init__(rows, family_name)
         self.name = "custom" if kind == "custommachinetypepricing" else "standard"
 
 
-    def parse(self, regions) -> list:
+    def parse(self, regions, requested=None) -> list:
         parsed_data = []
         for region in regions:
             region_alias = region.replace("-", "")
@@ -56,7 +56,7 @@ class BaseTable (GenericTable) :
             if "vcpus_od" in region_data and "memory_od" in region_data:
                 parsed_data.append(region_data)
             else:
-                print(f"WARNING! Incomplete {self.name} data for {self.family_name} in {region}")
+                self.warn(f"Incomplete {self.name} data for {self.family_name} in {region}", region, requested)
         return parsed_data
 
     def get_price_for_region(self, prices, region_data, region_alias, component, commit) -> None:
@@ -65,8 +65,6 @@ class BaseTable (GenericTable) :
             if (price_data == 'Unavailable'):
                 return
             price = float(price_data["priceByRegion"][region_alias])
-            if self.period == "monthly":
-                price *= 730
             region_data[f"{component}_{commit}"] = price
         except KeyError:
             pass
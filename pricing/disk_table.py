@@ -2,46 +2,47 @@ from pricing.generic_table import GenericTable
 import re
 import traceback
 
-base_re = re.compile('^(.+?) provisioned space$')
+base_re = re.compile('^(.+?) provisioned (space|IOPS|throughput)$')
+region_suffix = re.compile('-([0-9])$')
+
 class DiskTable (GenericTable) :
-    def __init__(self, rows, json_data, period) -> None:
-        super().__init__(rows, None, period)
+    def __init__(self, rows, json_data) -> None:
+        super().__init__(rows, None)
         self.name = "disk"
         self.json_data = json_data
 
-    def parse(self, regions) -> list:
+    def parse(self, regions, requested=None) -> list:
         parsed_data = []
         for index, row in enumerate(self.rows[1:]):
             prices = row["cells"]
             price_name = prices[0]
-            
-            if price_name in [
-                "Extreme provisioned IOPS",
-                "Hyperdisk Extreme provisioned IOPS",
-                "Hyperdisk Throughput provisioned throughput"
-            ]:
-                continue
 
             definition = base_re.search(price_name)
             if not definition:
                 print(f"WARNING! Incomplete {self.name} data for {price_name}")
                 continue
 
+            # space keeps the bare disk name, iops and throughput are priced apart
             name = definition.group(1).lower()
-            if name is None:
-                print(f"WARNING! Incomplete {self.name} data for {price_name}")
-                continue
+            if definition.group(2) != "space":
+                name = f"{name} {definition.group(2).lower()}"
             try:
                 taxonomy = prices[1]["taxonomy"]
             except Exception as ex:
                 print(f"WARNING! Failed to load taxonomy {self.name} data for {price_name}")
                 continue
 
+            try:
+                region_prices = self.get_regions_for_taxonomy(taxonomy)
+            except Exception as e:
+                print(f"WARNING! Taxonomy {taxonomy} not found: {traceback.format_exc()}")
+                continue
+
             for region in regions:
                 try:
-                    price = self.get_price_for_taxonomy(taxonomy, region, name)
+                    price = self.get_price_for_region(region_prices, region)
                     if (price is None):
-                        print(f"WARNING! Price not found for taxonomy {taxonomy} in region {region}")
+                        self.warn(f"Price not found for taxonomy {taxonomy} in region {region}", region, requested)
                     else:
                         parsed_data.append({
                             "name": name,
@@ -49,17 +50,20 @@ class DiskTable (GenericTable) :
                             "price": price
                         })
                 except Exception as e:
-                    print(f"WARNING! Price not found for taxonomy {taxonomy} in region {region}: {traceback.format_exc()}")
+                    self.warn(f"Price not found for taxonomy {taxonomy} in region {region}: {traceback.format_exc()}", region, requested)
                     continue
         return parsed_data
 
-    def get_price_for_taxonomy(self, taxonomy, region, name):
-        region_alias = re.sub(string=region, pattern="-([0-9])$", repl="\\1")
-        taxonomy = f"{taxonomy}.regions.{region_alias}.price.-1.nanos".lower().split(".")
-        price = self.json_data
-        for item in taxonomy:
-            if isinstance(price, list):
-                price = price[int(item)]
-            else:
-                price = price[item]
-        return int(price) / 1000000000
+    # the taxonomy path is walked once per row, down to its prices by region
+    def get_regions_for_taxonomy(self, taxonomy):
+        prices = self.json_data
+        for item in f"{taxonomy}.regions".lower().split("."):
+            prices = prices[item]
+        return prices
+
+    def get_price_for_region(self, region_prices, region):
+        region_alias = region_suffix.sub(string=region, repl="\\1").lower()
+        if not region_alias in region_prices:
+            return None
+        price = region_prices[region_alias]["price"][-1]
+        return int(price.get("units") or 0) + int(price["nanos"]) / 1000000000
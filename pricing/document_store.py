@@ -0,0 +1,119 @@
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+pool_size = 4
+timeout = 60
+
+
+# Raw pricing documents as downloaded, gzip compressed next to a small json
+# with the url and the ETag/Last-Modified headers of the response, so they can
+# be parsed again without being refetched and revalidated with conditional
+# requests. When local is set, documents are read from that directory instead.
+class DocumentStore:
+    def __init__(self, directory:str, local:str=None) -> None:
+        self.directory = directory
+        self.local = local
+        self.session = None
+        # when each document returned was fetched, a local one when its file
+        # was last modified
+        self.fetched = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["session"] = None
+        return state
+
+    def get_session(self) -> "requests.Session":
+        if self.session is None:
+            # requests is only imported once something is downloaded
+            import requests
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+        return self.session
+
+    def executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=pool_size)
+
+    def path(self, name:str) -> str:
+        return os.path.join(self.directory, name)
+
+    def metadata(self, name:str) -> dict:
+        try:
+            with open(self.path(f"{name}.json")) as metadata:
+                return json.load(metadata)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def read(self, name:str) -> str:
+        if self.metadata(name) is None:
+            return None
+        try:
+            with gzip.open(self.path(f"{name}.gz"), "rt", encoding="utf-8") as document:
+                return document.read()
+        except (FileNotFoundError, OSError, EOFError):
+            return None
+
+    def write(self, name:str, url:str, text:str, headers:dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if not text is None:
+            with gzip.open(self.path(f"{name}.gz"), "wt", encoding="utf-8") as document:
+                document.write(text)
+        # the metadata is written last, a document without it is not trusted
+        with open(self.path(f"{name}.json"), "w") as metadata:
+            json.dump({
+                "url": url,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "fetched": time()
+            }, metadata)
+
+    # the prices parsed from the documents are as old as the oldest of them
+    def oldest(self) -> float:
+        return min(self.fetched.values(), default=time())
+
+    def read_local(self, name:str) -> str:
+        path = os.path.join(self.local, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as local_file:
+            return local_file.read()
+
+    # stored documents are reused unless refresh is set, in which case they
+    # are revalidated against the ETag/Last-Modified they were served with
+    def fetch(self, name:str, url:str, refresh:bool=False) -> str:
+        if not self.local is None:
+            text = self.read_local(name)
+            if not text is None:
+                self.fetched[name] = os.path.getmtime(os.path.join(self.local, name))
+                return text
+            print(f"WARNING! {name} not found in {self.local}, downloading it")
+
+        text = self.read(name)
+        if not text is None and not refresh:
+            self.fetched[name] = self.metadata(name).get("fetched") or 0
+            return text
+
+        headers = {}
+        metadata = self.metadata(name)
+        if not text is None and metadata.get("url") == url:
+            if not metadata.get("etag") is None:
+                headers["If-None-Match"] = metadata["etag"]
+            if not metadata.get("last_modified") is None:
+                headers["If-Modified-Since"] = metadata["last_modified"]
+
+        response = self.get_session().get(url, headers=headers, timeout=timeout)
+        self.fetched[name] = time()
+        if response.status_code == 304:
+            self.write(name, url, None, {
+                "ETag": response.headers.get("ETag", metadata.get("etag")),
+                "Last-Modified": response.headers.get("Last-Modified", metadata.get("last_modified"))
+            })
+            return text
+        response.raise_for_status()
+        self.write(name, url, response.text, response.headers)
+        return response.text
@@ -1,4 +1,3 @@
-import requests
 from bs4 import BeautifulSoup
 import re 
 
@@ -37,15 +36,16 @@ region_codes = {
 
 
 class GCVEFrame:
-    def __init__(self) -> None:
+    # fetch(name, url) returns the text of a pricing document
+    def __init__(self, fetch) -> None:
         self.name = "predefined"
-        html_text = requests.get('https://cloud.google.com/vmware-engine/pricing').text
+        html_text = fetch('vmware-engine-pricing.html', 'https://cloud.google.com/vmware-engine/pricing')
         soup = BeautifulSoup(html_text, 'html.parser')
-        text = requests.get(soup.find('iframe').get('src')).text
+        text = fetch('vmware-engine-frame.html', soup.find('iframe').get('src'))
         soup = BeautifulSoup(text, 'html.parser')
         self.raw_data = soup.find('table').find('tbody').find_all('tr')
 
-    def parse(self, regions) -> list:
+    def parse(self, regions, requested=None) -> list:
         parsed_data = []
         for row in self.raw_data:
             if (row.td is None):
@@ -57,7 +57,8 @@ class GCVEFrame:
             for region in regions:
                 od = parse_number(row, 2, region, 'hourly')
                 if (od is None):
-                    print (f"Failed to load GCVE on-demand price for {region}")
+                    if requested is None or region in requested:
+                        print (f"Failed to load GCVE on-demand price for {region}")
                     continue
 
                 parsed_data.append({
@@ -66,10 +67,10 @@ class GCVEFrame:
                     "cpus": 72,
                     "memory": 768,
                     "region": region,
-                    "od": od * 730,
+                    "od": od,
                     "spot": None,
-                    "cud1y": parse_number(row.select_one('td:nth-of-type(2)'), 1, region, 'hourly') * 730,
-                    "cud3y": parse_number(row.select_one('td:nth-of-type(2)'), 3, region, 'hourly') * 730
+                    "cud1y": parse_number(row.select_one('td:nth-of-type(2)'), 1, region, 'hourly'),
+                    "cud3y": parse_number(row.select_one('td:nth-of-type(2)'), 3, region, 'hourly')
                 })
             return parsed_data
 
@@ -81,7 +82,7 @@ def cleanup_name(name):
     return name
 
 def parse_number(row, index, region=None, period=None):
-    cleanup = re.compile('[^0-9\.]+')
+    cleanup = re.compile(r'[^0-9\.]+')
     column = row.select_one('td:nth-of-type(%s)' % index)
     number = None
     if not column is None:
@@ -1,31 +1,43 @@
 from abc import ABC, abstractmethod
 import re
 
+# header matchers for each column, the first header cell matching wins
+header_matchers = {
+    column: re.compile(f'.*{name}.*', re.IGNORECASE)
+    for column, name in [
+        ("od", "price"),
+        ("spot", "spot"),
+        ("cud1y", "1.*y"),
+        ("cud3y", "3.*y"),
+        ("cpu", "((cpu)|(cores))"),
+        ("mem", "memory")
+    ]
+}
+
 class GenericTable(ABC):
     name: str
 
 
-    def __init__(self, rows, family_name, period) -> None:
+    # prices are kept hourly, the period is applied when quoting
+    def __init__(self, rows, family_name) -> None:
         self.rows = rows
         self.family_name = family_name
-        self.period = period
-        self.indexes = {
-            "od"    : self.get_index_for("price"),
-            "spot"  : self.get_index_for("spot"),
-            "cud1y" : self.get_index_for("1.*y"),
-            "cud3y" : self.get_index_for("3.*y"),
-            "cpu"   : self.get_index_for("((cpu)|(cores))"),
-            "mem"   : self.get_index_for("memory"),
-        }
+        self.indexes = self.get_indexes(self.rows[0]["cells"])
 
     @abstractmethod
-    def parse(self, regions) -> list:
+    def parse(self, regions, requested=None) -> list:
         pass
 
-    def get_index_for(self, name):
-        list = self.rows[0]["cells"]
-        query = re.compile(f'.*{name}.*', re.IGNORECASE)
-        for index, row in enumerate(list):
-            if query.match(row):
-                return index
-        return None
\ No newline at end of file
+    # every region in the source is parsed, only the requested ones are reported
+    def warn(self, message, region, requested):
+        if requested is None or region in requested:
+            print(f"WARNING! {message}")
+
+    @staticmethod
+    def get_indexes(header) -> dict:
+        indexes = dict.fromkeys(header_matchers)
+        for index, cell in enumerate(header):
+            for column, query in header_matchers.items():
+                if indexes[column] is None and query.match(cell):
+                    indexes[column] = index
+        return indexes
@@ -1,70 +1,66 @@
 import re
-cleanup = re.compile('[^0-9\.]+')
+cleanup = re.compile(r'[^0-9\.]+')
+per_vcpu = re.compile(r'\$([0-9\.]+) USD/hour per visible vCPU')
+sql_server = re.compile(r'SQL Server (\w+)\W.*?\$([0-9\.]+) USD/hour per visible vCPU', re.IGNORECASE)
+
+# price name, section and list item of the prices given in bold in a list
+tiered_prices = [
+    ('rhel_less_equal_4vcpus', 'rhel_images', 1),
+    ('rhel_more_4vcpus', 'rhel_images', 2),
+    ('rhel_sap_less_equal_4vcpus', 'rhel_sap_images', 1),
+    ('rhel_sap_more_4vcpus', 'rhel_sap_images', 2),
+    ('sles', 'suse_images', 2),
+    ('sles_sap_less_equal_2vcpus', 'suse_sap_images', 1),
+    ('sles_sap_less_equal_4vcpus', 'suse_sap_images', 2),
+    ('sles_sap_more_4vcpus', 'suse_sap_images', 3),
+]
 
 class Licenses:
-    def __init__(self, soup, period) -> None:
+    # sections of the pricing page the prices are read from
+    sections = sorted({section for name, section, item in tiered_prices}) + ['windows_server_pricing', 'sql_server_pricing']
+
+    def __init__(self, soup) -> None:
         self.name = "images"
         self.soup = soup
-        self.period = period
 
     def parse(self) -> list:
-        multiplier = 730 if self.period == "monthly" else 1
         parsed_data = {}
-        try:
-
-            parsed_data['rhel_less_equal_4vcpus'] = float(
-                cleanup.sub("", 
-                    self.soup.find('h3', {"id": "rhel_images"})
-                        .find_next_sibling('p')
-                        .select_one('li:nth-of-type(1)')
-                        .find('strong')
-                        .text
+        for name, section, item in tiered_prices:
+            try:
+                parsed_data[name] = float(
+                    cleanup.sub("",
+                        self.soup.find('h3', {"id": section})
+                            .find_next_sibling('p')
+                            .select_one(f'li:nth-of-type({item})')
+                            .find('strong')
+                            .text
+                    )
                 )
-            ) * multiplier
-        except Exception as e:
-            print("Failed to load rhel_less_equal_4vcpus: %s" % e)
-            pass
-
-        try:
-            parsed_data['rhel_more_4vcpus'] = float(
-                cleanup.sub("", 
-                    self.soup.find('h3', {"id": "rhel_images"})
-                    .find_next_sibling('p')
-                    .select_one('li:nth-of-type(2)')
-                    .find('strong')
-                    .text
-                )
-            ) * multiplier
-        except Exception as e:
-            print("Failed to load rhel_more_4vcpus: %s" % e)
-            pass
-
-        try:
-            parsed_data['sles'] = float(
-                cleanup.sub("", 
-                    self.soup.find('h3', {"id": "suse_images"})
-                    .find_next_sibling('p')
-                    .select_one('li:nth-of-type(2)')
-                    .find('strong')
-                    .text
-                )
-            ) * multiplier
-        except Exception as e:
-            print("Failed to load sles: %s" % e)
-            pass
+            except Exception as e:
+                print("Failed to load %s: %s" % (name, e))
+                pass
 
         try:
             parsed_data['windows_per_core'] =float(
-                re.search(
-                    '\$([0-9\.]+) USD/hour per visible vCPU', 
+                per_vcpu.search(
                     self.soup.find('h3', {"id": "windows_server_pricing"})
                     .find_next('ul')
                     .select_one('li:nth-of-type(2)')
                     .text
                 ).group(1)
-            ) * multiplier
+            )
         except  Exception as e:
             print("Failed to load windows_per_core: %s" % e)
             pass
 
-        return parsed_data
\ No newline at end of file
+        # one price per edition, e.g. sql_server_enterprise_per_core
+        try:
+            for item in self.soup.find('h3', {"id": "sql_server_pricing"}).find_next('ul').find_all('li'):
+                edition = sql_server.search(item.text)
+                if not edition is None:
+                    parsed_data[f'sql_server_{edition.group(1).lower()}_per_core'] = float(edition.group(2))
+        except  Exception as e:
+            print("Failed to load sql_server: %s" % e)
+            pass
+
+        return parsed_data
@@ -12,22 +12,18 @@ field_indexes = {
     "cud3y" : 4
 }
 
-predefined_names = re.compile('^\w{2,3}-.+?(-\d{1,3})?$', re.IGNORECASE)
+predefined_names = re.compile(r'^\w{2,3}-.+?(-\d{1,3})?$', re.IGNORECASE)
 def is_predefined(name:str): 
     return predefined_names.match(name)
 
 
 class PredefinedTable (GenericTable) :
-    def __init__(self, rows, family_name, period) -> None:
-        super().__init__(rows, family_name, period)
+    def __init__(self, rows, family_name) -> None:
+        super().__init__(rows, family_name)
         self.name="predefined"
-        if period == "monthly":
-            self.muliplier = 730
-        else:
-            self.muliplier = 1
 
 
-    def parse(self, regions) -> list:
+    def parse(self, regions, requested=None) -> list:
         parsed_data = []
         for row in self.rows[1:]:
             prices = row["cells"]
@@ -47,16 +43,16 @@ class PredefinedTable (GenericTable) :
                 cud1y = None
                 cud3y = None
                 try:
-                    od =  self.muliplier * float(prices[self.indexes["od"]]["priceByRegion"][region_alias])
+                    od =  float(prices[self.indexes["od"]]["priceByRegion"][region_alias])
                     if not self.indexes["spot"] is None:
                         if not prices[self.indexes["spot"]] == "Unavailable":
-                            spot =  self.muliplier * float(prices[self.indexes["spot"]]["priceByRegion"][region_alias])
+                            spot =  float(prices[self.indexes["spot"]]["priceByRegion"][region_alias])
                     if not self.indexes["cud1y"] is None:
                         if prices[self.indexes["cud1y"]] != "**":
-                            cud1y =  self.muliplier * float(prices[self.indexes["cud1y"]]["priceByRegion"][region_alias])
+                            cud1y =  float(prices[self.indexes["cud1y"]]["priceByRegion"][region_alias])
                     if not self.indexes["cud3y"] is None:
                         if prices[self.indexes["cud3y"]] != "**":
-                            cud3y =  self.muliplier *  float(prices[self.indexes["cud3y"]]["priceByRegion"][region_alias])
+                            cud3y =  float(prices[self.indexes["cud3y"]]["priceByRegion"][region_alias])
                 except KeyError as e:
                     pass
 
@@ -0,0 +1,172 @@
+import json
+import mmap
+import struct
+import zlib
+import numpy as np
+
+magic = b"RVTPRICE"
+schema_version = 5
+# magic, schema version, header length
+preamble = struct.Struct("<8sII")
+alignment = 8
+
+
+class StaleCacheError(Exception):
+    pass
+
+
+def aligned(offset:int) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+# Binary price cache: a small json header (schema version, update time per
+# region, string table and column layout) followed by one 8-byte
+# aligned array per table column, read back through a memory map.
+class PriceCache:
+    def __init__(self, path:str) -> None:
+        self.path = path
+
+    def add(self, array) -> dict:
+        offset = aligned(self.size)
+        self.arrays.append((offset, array))
+        self.size = offset + array.nbytes
+        return {"dtype": array.dtype.str, "offset": offset, "length": len(array)}
+
+    def write(self, header:dict, tables:dict, indexes:dict) -> None:
+        strings = []
+        string_ids = {}
+        layout = {}
+        self.arrays = []
+        self.size = 0
+
+        for name, rows in tables.items():
+            keys = list(dict.fromkeys(key for row in rows for key in row))
+            columns = {}
+            for key in keys:
+                values = [row.get(key) for row in rows]
+                present = [value for value in values if not value is None]
+                if any(isinstance(value, str) for value in present):
+                    ids = []
+                    for value in values:
+                        if value is None:
+                            ids.append(-1)
+                            continue
+                        if not value in string_ids:
+                            string_ids[value] = len(strings)
+                            strings.append(value)
+                        ids.append(string_ids[value])
+                    column = self.add(np.array(ids, dtype="<i4"))
+                    column["kind"] = "string"
+                elif all(isinstance(value, int) and not isinstance(value, bool) for value in present) and len(present) == len(values):
+                    column = self.add(np.array(values, dtype="<i8"))
+                    column["kind"] = "int"
+                else:
+                    column = self.add(np.array([np.nan if value is None else value for value in values], dtype="<f8"))
+                    column["kind"] = "float"
+                    # rows holding ints in a mostly float column, e.g. the gcve node cpus
+                    column["integers"] = [
+                        row for row, value in enumerate(values)
+                        if isinstance(value, int) and not isinstance(value, bool)
+                    ]
+                # keys missing from some rows are left out again when reading
+                column["optional"] = any(not key in row for row in rows)
+                columns[key] = column
+            layout[name] = {"rows": len(rows), "columns": columns}
+
+        index_layout = {
+            name: {region: self.add(np.array(positions, dtype="<i4")) for region, positions in regions.items()}
+            for name, regions in indexes.items()
+        }
+
+        payload = bytearray(aligned(self.size))
+        for start, array in self.arrays:
+            payload[start:start + array.nbytes] = array.tobytes()
+
+        header = dict(header)
+        header.update({
+            "strings": strings,
+            "tables": layout,
+            "indexes": index_layout,
+            "checksum": zlib.crc32(payload),
+            "payload": len(payload)
+        })
+        encoded = json.dumps(header).encode("utf-8")
+        start = aligned(preamble.size + len(encoded))
+        with open(self.path, "wb") as cache:
+            cache.write(preamble.pack(magic, schema_version, len(encoded)))
+            cache.write(encoded)
+            cache.write(b"\0" * (start - preamble.size - len(encoded)))
+            cache.write(payload)
+
+    def read(self):
+        with open(self.path, "rb") as cache:
+            try:
+                data = mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise StaleCacheError("empty cache file")
+        try:
+            return self.parse(data)
+        finally:
+            data.close()
+
+    def parse(self, data):
+        if len(data) < preamble.size:
+            raise StaleCacheError("truncated cache file")
+        file_magic, version, header_length = preamble.unpack_from(data, 0)
+        if file_magic != magic:
+            raise StaleCacheError("not a price cache file")
+        if version != schema_version:
+            raise StaleCacheError(f"cache schema {version} is not the current schema {schema_version}")
+        try:
+            header = json.loads(bytes(data[preamble.size:preamble.size + header_length]))
+        except ValueError:
+            raise StaleCacheError("corrupt cache header")
+
+        start = aligned(preamble.size + header_length)
+        payload = memoryview(data)[start:]
+        try:
+            if len(payload) != header["payload"] or zlib.crc32(payload) != header["checksum"]:
+                raise StaleCacheError("cache payload checksum mismatch")
+
+            strings = header["strings"]
+            tables = {}
+            for name, table in header["tables"].items():
+                values = {}
+                for key, layout in table["columns"].items():
+                    column = self.column(payload, layout)
+                    if layout["kind"] == "string":
+                        values[key] = [None if index < 0 else strings[index] for index in column]
+                    elif layout["kind"] == "int":
+                        values[key] = column
+                    else:
+                        values[key] = [None if value != value else value for value in column]
+                        for row in layout["integers"]:
+                            values[key][row] = int(values[key][row])
+                optional = {key for key, layout in table["columns"].items() if layout["optional"]}
+                tables[name] = [
+                    {
+                        key: values[key][row] for key in values
+                        if not (key in optional and values[key][row] is None)
+                    }
+                    for row in range(table["rows"])
+                ]
+
+            indexes = {
+                name: {region: self.column(payload, layout) for region, layout in regions.items()}
+                for name, regions in header["indexes"].items()
+            }
+        except (KeyError, TypeError, ValueError) as ex:
+            raise StaleCacheError(f"corrupt cache payload: {ex}")
+        finally:
+            payload.release()
+
+        for name in ["strings", "tables", "indexes", "checksum", "payload"]:
+            header.pop(name)
+        return header, tables, indexes
+
+    # arrays are copied out of the map so it can be closed right after reading
+    def column(self, payload, layout) -> list:
+        if layout["length"] == 0:
+            return []
+        array = np.frombuffer(payload, dtype=np.dtype(layout["dtype"]), count=layout["length"], offset=layout["offset"])
+        return array.tolist()
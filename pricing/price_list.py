@@ -1,19 +1,55 @@
+import functools
 import json
 import math
+import numpy as np
 import re
-from time import time
-import requests
-from bs4 import BeautifulSoup
-from tqdm import tqdm
-from pricing import TableFactory, GCVEFrame, Licenses
-from operator import itemgetter
+from time import perf_counter
+from pricing import PredefinedIndex, CustomIndex, QuoteCache, PriceCache, StaleCacheError, DocumentStore, priced
 from datetime import datetime
-
-
-windows = re.compile('.*windows.*', re.IGNORECASE)
-sles = re.compile('.*SUSE.*', re.IGNORECASE)
-rhel = re.compile('.*Red Hat.*', re.IGNORECASE)
-free = re.compile('.*((debian)|(centos)|(coreos)|(ubuntu)).*', re.IGNORECASE)
+import telemetry
+
+
+# an edition is only read between SQL Server and the windows it runs on,
+# whose own editions are also named Standard, Enterprise or Web
+sql_server = 'SQL Server(?:(?!windows).)*\\b'
+license_patterns = [
+    # free editions, and editions not recognised, only pay for windows
+    ('windows', sql_server + '(?:Express|Developer)\\b'),
+    ('sql_server_enterprise', sql_server + 'Enterprise\\b'),
+    ('sql_server_web', sql_server + 'Web\\b'),
+    ('sql_server_standard', sql_server + 'Standard\\b'),
+    ('windows', 'SQL Server'),
+    ('windows', 'windows'),
+    ('sles_sap', 'SUSE.*\\bSAP\\b'),
+    ('sles', 'SUSE'),
+    ('rhel_sap', 'Red Hat.*\\bSAP\\b'),
+    ('rhel', 'Red Hat')
+]
+# one alternation, tried in order so premium images win over their base image
+license_kinds = re.compile('|'.join(f'(?P<kind{index}>.*{pattern})' for index, (kind, pattern) in enumerate(license_patterns)), re.IGNORECASE)
+
+# premium images priced as their base image when the page did not list them
+license_bases = {
+    'sql_server_enterprise': 'windows',
+    'sql_server_web': 'windows',
+    'sql_server_standard': 'windows',
+    'sles_sap': 'sles',
+    'rhel_sap': 'rhel'
+}
+
+# exports hold a handful of distinct os strings, each is classified once;
+# bounded as serve.py classifies whatever its clients send
+@functools.lru_cache(maxsize=1024)
+def classify_os(os:str) -> str:
+    match = license_kinds.match(os)
+    return None if match is None else license_patterns[int(match.lastgroup[len('kind'):])][0]
+
+cache_file = 'price_loader.cache'
+documents_directory = 'price_loader.documents'
+period_hours = {
+    "hourly": 1,
+    "monthly": 730
+}
 
 class PriceList:
     def __init__(self, regions, period, ignore_cache, local_file):
@@ -21,6 +57,13 @@ class PriceList:
         self.period = period
         self.ignore_cache = ignore_cache
         self.local_file = local_file
+        self.multiplier = period_hours[period]
+        # -l without a directory reads the html folder
+        self.documents = DocumentStore(documents_directory, 'html' if local_file is True else (local_file or None))
+        self.quotes = QuoteCache()
+        # quotes select_prices_batch priced for a distinct (vCPU, GB) pair or
+        # reused for the vms repeating it, apart from the quote cache
+        self.batch_quotes = {"priced": 0, "reused": 0}
 
         self.lists = { 
             'disk': [],
@@ -30,64 +73,164 @@ class PriceList:
             "images" : {}
         }
 
-        if not self.load_from_cache():
+        self.cached_indexes = {}
+        self.updates = {}
+        missing = self.load_from_cache()
+        if missing is None:
             print("Ignoring cache")
-            self.load_data()
-            self.parse_data()
-            self.last_update = time() #TODO: mover para save_cache()
+            missing = list(self.regions)
+        elif len(missing) > 0:
+            print(f"\tloading missing regions: {', '.join(missing)}")
+
+        if len(missing) > 0:
+            with telemetry.span("load_data", regions=len(missing)):
+                self.load_data()
+            regions = self.source_regions(missing)
+            # regions parsed before without machine types were left out of
+            # the cache, their other prices are parsed again
+            for name in ['disk', 'standard', 'custom']:
+                self.lists[name] = [item for item in self.lists[name] if not item["region"] in regions]
+            with telemetry.span("parse_data", regions=len(regions)):
+                self.parse_data(regions)
             self.fill_empty_prices()
-            self.load_gcve_data()
-            self.parse_premium_images()
+            with telemetry.span("load_gcve_data"):
+                self.load_gcve_data(regions)
+            with telemetry.span("parse_premium_images"):
+                self.parse_premium_images()
+            # only regions with machine types are cached, prices are dated by
+            # their documents, which may have been stored long before
+            priced = {item["region"] for item in self.lists['predefined']}
+            fetched = self.documents.oldest()
+            self.updates.update({region: fetched for region in regions if region in priced})
+            unpriced = [region for region in missing if not region in priced]
+            if len(unpriced) > 0:
+                print(f"WARNING! no machine types found for {', '.join(unpriced)} in the pricing documents, their vms cannot be priced")
+            self.last_update = self.updated()
+        with telemetry.span("build_indexes"):
+            self.build_indexes()
+        if len(missing) > 0:
             self.save_cache()
 
-
+    def build_indexes(self):
+        self.quotes.clear()
+        frontiers = self.cached_indexes.get('predefined', {})
+        self.predefined_index = {
+            region: PredefinedIndex(
+                self.lists['predefined'],
+                region,
+                None if not region in frontiers else [self.lists['predefined'][position] for position in frontiers[region]],
+                self.multiplier
+            )
+            for region in self.regions
+        }
+        self.custom_index = {
+            region: CustomIndex(self.lists['custom'], region, self.multiplier)
+            for region in self.regions
+        }
+        # like the list scan it replaces, the first price listed wins
+        self.disk_prices = {}
+        for disk in self.lists['disk']:
+            self.disk_prices.setdefault((disk["region"], disk["name"]), disk["price"])
+
+
+    # the parsed source documents are only needed while loading, so they are
+    # not shipped to worker processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attribute in ['soup', 'tables', 'json_data', 'gcve_frame']:
+            state.pop(attribute, None)
+        return state
+
+    # returns the requested regions missing from the cache, or None when
+    # there is no usable cache
     def load_from_cache(self):
         if self.ignore_cache:
-            return False
+            return None
         try:
-            with open('price_loader.json') as cache:
-                data = json.load(cache)
-                if not all(region in data['regions'] for region in self.regions):
-                    return False
-                self.lists = data["lists"]
-                self.last_update = datetime.fromtimestamp(data["last_update"]).strftime("%Y-%m-%d")
-                self.regions = data['regions']
-                print(f"WARNING! using cache file 'price_loader.json' from {self.last_update}\n\t{self.count()}")
-                print(f"\tuse -nc to avoid caching or delete the file")
-                return True
+            header, tables, indexes = PriceCache(cache_file).read()
         except FileNotFoundError:
-            return False
-
+            return None
+        except StaleCacheError as ex:
+            print(f"WARNING! discarding cache file '{cache_file}': {ex}")
+            return None
+        self.lists = tables
+        self.lists["images"] = header["images"]
+        self.cached_indexes = indexes
+        self.updates = header['regions']
+        missing = [region for region in self.regions if not region in self.updates]
+        self.last_update = self.updated()
+        print(f"WARNING! using cache file '{cache_file}' from {self.last_update}\n\t{self.count()}")
+        # the stored documents can be of any age, only -nc revalidates them
+        print(f"\tuse -nc to fetch fresh prices (or delete '{documents_directory}' along with the file)")
+        return missing
+
+    # regions are cached at different times, the oldest requested one dates the prices
+    def updated(self):
+        updates = [self.updates[region] for region in self.regions if region in self.updates] or self.updates.values()
+        return (datetime.fromtimestamp(min(updates)) if len(updates) > 0 else datetime.now()).strftime("%Y-%m-%d")
+
+    # every region priced in the source documents is parsed along with the
+    # requested ones, so later runs for other regions are served from the cache
+    def source_regions(self, requested) -> list:
+        regions = set(requested)
+        pending = [self.json_data]
+        while len(pending) > 0:
+            item = pending.pop()
+            if isinstance(item, dict):
+                for key, value in item.items():
+                    if key == "regions" and isinstance(value, dict):
+                        regions.update(value)
+                    else:
+                        pending.append(value)
+            elif isinstance(item, list):
+                pending.extend(item)
+        return sorted(region for region in regions if not region in self.updates)
+
+    # the sources are fetched concurrently, the GCVE page and its frame being
+    # chained in their own thread while the compute pricing is parsed
     def load_data(self):
-        if self.local_file:
-            with open('html/all-pricing.html') as local_file:
-                html_text = local_file.read()
-            with open('html/gcp-compute.json') as local_file:
-                json_text = local_file.read()
-        else:
-            html_text = requests.get('https://cloud.google.com/compute/all-pricing').text
-            json_text = requests.get("https://www.gstatic.com/cloud-site-ux/pricing/data/gcp-compute.json").text
-
-        self.soup = BeautifulSoup(html_text, 'html.parser')
-        self.raw_data = self.soup.find_all('cloudx-pricing-table')
-        self.json_data = json.loads(json_text)
-
-
+        # the scraping stack is only imported when the pages are parsed
+        from bs4 import BeautifulSoup
+        from pricing import GCVEFrame, Licenses, PricingPage
+        with self.documents.executor() as executor:
+            gcve_frame = executor.submit(GCVEFrame, self.fetch)
+            html_text = executor.submit(self.fetch, 'all-pricing.html', 'https://cloud.google.com/compute/all-pricing')
+            json_text = executor.submit(self.fetch, 'gcp-compute.json', "https://www.gstatic.com/cloud-site-ux/pricing/data/gcp-compute.json")
+
+            started = perf_counter()
+            page = PricingPage(Licenses.sections).parse(html_text.result())
+            self.tables = page.tables
+            self.soup = BeautifulSoup(page.html, 'html.parser')
+            print(f"\tparsed pricing page in {perf_counter() - started:.2f}s")
+            self.json_data = json.loads(json_text.result())
+            self.gcve_frame = gcve_frame.result()
+
+    # downloaded documents are kept, -nc revalidates them
+    def fetch(self, name, url) -> str:
+        return self.documents.fetch(name, url, self.ignore_cache)
+
+    # the lists also hold the other regions of the sources, only the
+    # requested ones are counted, as listing() lists them
     def count(self):
+        def requested(name):
+            return sum(1 for item in self.lists[name] if item["region"] in self.regions)
         return "loaded {predefined} pre-defined types, {custom} customizable families, {disk} disk prices and {os} O.S. prices.".format(
-            predefined=len(self.lists['predefined']),
-            custom=len(self.lists['custom']),
-            disk=len(self.lists['disk']),
+            predefined=requested('predefined'),
+            custom=requested('custom'),
+            disk=requested('disk'),
             os=len(self.lists["images"])
         )
 
-    def parse_data(self):
-        for data in self.raw_data:
-            table = TableFactory.from_data(data, self.period, self.json_data)
+    def parse_data(self, regions):
+        from pricing import TableFactory
+        for id, layout in self.tables:
+            table = TableFactory.from_data(id, layout, self.json_data)
             if table is None:
                 continue    
 
-            pricing = table.parse(self.regions)
+            with telemetry.span("parse_table", table=id, kind=table.name, family=table.family_name) as span:
+                pricing = table.parse(regions, self.regions)
+                span.set_attribute("prices", 0 if pricing is None else len(pricing))
             if pricing is None:
                 continue
 
@@ -115,33 +258,51 @@ class PriceList:
         return item
 
 
-    def load_gcve_data(self):
-        frame = GCVEFrame()
-        pricing = frame.parse(self.regions)
+    def load_gcve_data(self, regions):
+        frame = self.gcve_frame
+        pricing = frame.parse(regions, self.regions)
         if not pricing is None:
             self.lists[frame.name].extend(pricing)
 
     def parse_premium_images(self) -> dict:
-        licenses = Licenses(self.soup, self.period)
+        from pricing import Licenses
+        licenses = Licenses(self.soup)
         if not licenses is None:
             self.lists[licenses.name].update(licenses.parse())
 
     def save_cache(self):
-        with open('price_loader.json', 'w') as cache:
-            json.dump(
-                {
-                    "last_update" : self.last_update,
-                    "regions" : self.regions,
-                    "lists": self.lists
-                }, 
-                cache
-            )
+        positions = {id(item): position for position, item in enumerate(self.lists['predefined'])}
+        frontiers = {
+            region: [positions[id(shape)] for shape in index.shapes]
+            for region, index in self.predefined_index.items()
+            if region in self.updates
+        }
+        # frontiers of cached regions not requested this time are still valid,
+        # the tables are only ever appended to
+        for region, frontier in self.cached_indexes.get('predefined', {}).items():
+            frontiers.setdefault(region, frontier)
+        PriceCache(cache_file).write(
+            {
+                "regions" : self.updates,
+                "images" : self.lists["images"]
+            },
+            {name: self.lists[name] for name in ['disk', 'predefined', 'standard', 'custom']},
+            {"predefined": frontiers}
+        )
 
 
     def select_price(self, commit, cpus, memory, region, verbose=False):
         cpu = math.ceil(cpus)
         mem = math.ceil(memory/1024)
 
+        if verbose:
+            return self.quote(commit, cpu, mem, region, verbose)
+        return self.quotes.get(
+            ('compute', commit, cpu, mem, region),
+            lambda: self.quote(commit, cpu, mem, region)
+        )
+
+    def quote(self, commit, cpu, mem, region, verbose=False):
         if verbose:
             print('commit:\t\t`{commit}`'.format(commit=commit))
         predefined = self.get_predefined_type(commit, region, cpu, mem)
@@ -167,65 +328,102 @@ class PriceList:
         return predefined
 
 
+    def select_prices_batch(self, commit, cpus, memory, region) -> list:
+        cpu = np.ceil(np.asarray(cpus, dtype=float)).astype(np.int64)
+        mem = np.ceil(np.asarray(memory, dtype=float)/1024).astype(np.int64)
+        if len(cpu) == 0:
+            return []
+        predefined_index = self.predefined_index.get(region)
+        custom_index = self.custom_index.get(region)
+        if predefined_index is None:
+            return [None] * len(cpu)
+
+        # inventories are repetitive, so only distinct (vCPU, GB) pairs are priced
+        pairs, inverse = np.unique(np.stack([cpu, mem], axis=1), axis=0, return_inverse=True)
+        self.batch_quotes["priced"] += len(pairs)
+        self.batch_quotes["reused"] += len(cpu) - len(pairs)
+        shapes = predefined_index.find_batch(pairs[:, 0], pairs[:, 1])
+        families, family_cpu, family_mem = custom_index.find_batch(pairs[:, 0], pairs[:, 1], True)
+
+        quotes = []
+        for shape, family, custom_cpu, custom_mem in zip(shapes, families, family_cpu, family_mem):
+            if shape < 0:
+                quotes.append(None)
+                continue
+            predefined = predefined_index.priced[shape]
+            custom = None if family < 0 else custom_index.shape(int(family), int(custom_cpu), int(custom_mem))
+            quotes.append(self.cheapest(commit, predefined, custom))
+        return [quotes[index] for index in inverse.ravel()]
+
+    # the quote cache only serves select_price, its stats are left out
+    # until it is used
+    def quote_stats(self) -> str:
+        priced, reused = self.batch_quotes["priced"], self.batch_quotes["reused"]
+        ratio = (100 * reused / (priced + reused)) if priced + reused else 0
+        stats = [f"batch quotes: {priced} priced, {reused} reused ({ratio:.1f}% reused)"]
+        if self.quotes.hits + self.quotes.misses > 0:
+            stats.append(self.quotes.stats())
+        return "\n".join(stats)
+
+    def cheapest(self, commit, predefined, custom_family):
+        if custom_family is None:
+            return predefined
+        if predefined[commit] is None or custom_family[commit] < predefined[commit]:
+            return custom_family
+        return predefined
+
     def select_disk_price(self, name, region) -> float:
-        return [disk["price"] for disk in self.lists['disk'] if (
-            disk["region"] == region and 
-            disk["name"]==name
-        )][0]
-
-    def get_cpu(self, custom, cpu):
-        return int(max(cpu, custom["cpu_min"]))
-
-    def get_memory(self, custom, cpu, mem):
-        return int(max(mem, math.ceil(self.get_cpu(custom, cpu)*custom['memory_min'])))
-
-    def get_custom_families(self, region:str, cpu:int, mem:int, cud:bool=False) -> dict:
-        return sorted(
-            [{
-                "family": custom['name'],
-                'name': "%s-custom-%s-%s" % (custom['name'], self.get_cpu(custom, cpu), self.get_memory(custom, cpu, mem)), 
-                "cpus": self.get_cpu(custom, cpu),
-                "memory": self.get_memory(custom, cpu, mem),
-                "region": region,
-                'spot': custom["vcpus_spot"]*self.get_cpu(custom, cpu) + custom["memory_spot"]*self.get_memory(custom, cpu, mem), 
-                'od': round((custom["vcpus_od"]*self.get_cpu(custom, cpu) + custom["memory_od"]*self.get_memory(custom, cpu, mem)),2), 
-                'cud1y': round((custom["vcpus_cud1y"]*self.get_cpu(custom, cpu) + custom["memory_cud1y"]*self.get_memory(custom, cpu, mem)),2), 
-                'cud3y': round((custom["vcpus_cud3y"]*self.get_cpu(custom, cpu) + custom["memory_cud3y"]*self.get_memory(custom, cpu, mem)),2)
-            } for custom in self.lists['custom'] if (
-                custom["region"] == region and 
-                custom["cpu_max"] >= self.get_cpu(custom, cpu) and 
-                custom["memory_max"] >= self.get_memory(custom, cpu, mem) / self.get_cpu(custom, cpu)
-            )],
-            key=itemgetter('cud1y' if cud else 'od')
-        )
+        price = self.disk_prices.get((region, name))
+        if price is None:
+            raise IndexError(f"no {name} disk price in {region}")
+        return price
 
     def get_custom_family(self, region:str, cpu:int, mem:int, cud:bool=False) -> dict:
-        custom = self.get_custom_families(region, cpu, mem, cud)
-        return None if len(custom) == 0 else custom[0]
+        index = self.custom_index.get(region)
+        return None if index is None else index.find(cpu, mem, cud)
 
     def get_predefined_type(self, commit:str, region:str, cpu:int, mem:int):
-        return [predefined for predefined in sorted(
-            self.lists['predefined'],
-            key=itemgetter('od')
-        ) if (
-            predefined["region"] == region and 
-            predefined["cpus"] >= cpu and 
-            predefined["memory"] >= mem
-        )][0]
+        index = self.predefined_index.get(region)
+        predefined = None if index is None else index.find(cpu, mem)
+        if predefined is None:
+            raise IndexError(f"no pre-defined type with {cpu} vCPUs and {mem} GB in {region}")
+        return predefined
 
     def get_gcve_price(self, region:str):
         price = [predefined for predefined in self.lists['predefined'] if (
             predefined["region"] == region and 
             predefined["name"] == "ve1-standard-72"
         )]
-        return None if len(price) == 0 else price[0]
-
-    def get_os_price(self, os, cpus): 
-        if windows.match(os):
-            return self.lists["images"]['windows_per_core'] * cpus
-        elif sles.match(os):
-            return self.lists["images"]['sles']
-        elif rhel.match(os):
-            return self.lists["images"]['rhel_less_equal_4vcpus'] if cpus <= 4 else self.lists["images"]['rhel_more_4vcpus']
-        else:
+        return None if len(price) == 0 else priced(price[0], self.multiplier)
+
+    def get_os_price(self, os, cpus):
+        return self.get_license_price(classify_os(os), cpus)
+
+    def get_license_price(self, kind, cpus):
+        images = self.lists["images"]
+        if kind in license_bases and not any(key.startswith(f"{kind}_") for key in images):
+            kind = license_bases[kind]
+
+        if kind is None:
             return 0
+        elif kind == 'windows':
+            return images['windows_per_core'] * self.multiplier * cpus
+        elif kind.startswith('sql_server'):
+            # sql server images run on windows, both are charged per vCPU
+            return self.get_license_price('windows', cpus) + images[f'{kind}_per_core'] * self.multiplier * cpus
+        elif kind == 'sles':
+            return images['sles'] * self.multiplier
+        elif kind == 'sles_sap':
+            if cpus <= 2:
+                return images['sles_sap_less_equal_2vcpus'] * self.multiplier
+            return (images['sles_sap_less_equal_4vcpus'] if cpus <= 4 else images['sles_sap_more_4vcpus']) * self.multiplier
+        else:
+            return (images[f'{kind}_less_equal_4vcpus'] if cpus <= 4 else images[f'{kind}_more_4vcpus']) * self.multiplier
+
+    # a list for the requested regions, with its prices in the quoted period
+    def listing(self, name):
+        if name == "images":
+            return [{key: value * self.multiplier for key, value in self.lists["images"].items()}]
+        # disks are priced per GB-month whatever the period
+        multiplier = 1 if name == "disk" else self.multiplier
+        return [priced(item, multiplier) for item in self.lists[name] if item["region"] in self.regions]
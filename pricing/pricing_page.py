@@ -0,0 +1,82 @@
+import html
+import re
+
+# comments and script/style bodies are skipped whole, everything else is a tag
+token = re.compile(
+    r'''<!--.*?-->|<(script|style)\b.*?</\1\s*>|<(/?)([a-zA-Z][\w:-]*)((?:[^>"']|"[^"]*"|'[^']*')*)>''',
+    re.DOTALL | re.IGNORECASE
+)
+attribute = re.compile(r'''([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+
+void_tags = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+heading_tags = {'h3', 'h4'}
+section_tags = {'h1', 'h2', 'h3', 'h4'}
+
+
+def attributes(text:str) -> dict:
+    values = {}
+    for match in attribute.finditer(text):
+        value = next((group for group in match.group(2, 3, 4) if not group is None), None)
+        if not value is None and '&' in value:
+            # layouts are full of escaped quotes, replaced ahead of the slower generic unescape
+            value = html.unescape(value.replace('&#x27;', "'").replace('&quot;', '"'))
+        values.setdefault(match.group(1).lower(), value)
+    return values
+
+
+# Single pass over the all-pricing page. Every cloudx-pricing-table is
+# collected as (id of the nearest preceding h3/h4 sibling, layout), and the
+# html of the requested sections (a heading up to the next one) is kept as
+# text for the few lookups that still need a soup. Only the attributes of
+# headings and tables are decoded.
+class PricingPage:
+    def __init__(self, sections:list=None) -> None:
+        self.sections = set(sections or [])
+        self.tables = []
+        self.section_html = []
+
+    def parse(self, html_text:str) -> "PricingPage":
+        # open elements, each with the id of its last h3/h4 child so far
+        stack = [[None, None]]
+        section_start = None
+        for match in token.finditer(html_text):
+            tag = match.group(3)
+            if tag is None:
+                continue
+            tag = tag.lower()
+
+            if match.group(2):
+                # like the soup, an end tag closes everything opened after
+                # its element and a stray one is ignored
+                for index in range(len(stack) - 1, 0, -1):
+                    if stack[index][0] == tag:
+                        del stack[index:]
+                        break
+                continue
+
+            parent = stack[-1]
+            if tag in section_tags:
+                values = attributes(match.group(4))
+                if not section_start is None:
+                    self.section_html.append(html_text[section_start:match.start()])
+                    section_start = None
+                if values.get('id') in self.sections:
+                    section_start = match.start()
+                if tag in heading_tags:
+                    parent[1] = values.get('id')
+            elif tag == 'cloudx-pricing-table':
+                self.tables.append((parent[1], attributes(match.group(4)).get('layout')))
+
+            if not tag in void_tags and not match.group(4).endswith('/'):
+                stack.append([tag, None])
+
+        if not section_start is None:
+            self.section_html.append(html_text[section_start:])
+        return self
+
+    @property
+    def html(self) -> str:
+        return ''.join(self.section_html)
@@ -0,0 +1,32 @@
+from collections import OrderedDict
+
+
+class QuoteCache:
+    def __init__(self, maxsize:int=4096) -> None:
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        try:
+            value = self.entries[key]
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        except KeyError:
+            pass
+        self.misses += 1
+        value = compute()
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        ratio = (100 * self.hits / total) if total else 0
+        return f"quote cache: {self.hits} hits, {self.misses} misses ({ratio:.1f}% hit ratio), {len(self.entries)}/{self.maxsize} entries"
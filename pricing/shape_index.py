@@ -0,0 +1,151 @@
+import math
+import re
+from operator import itemgetter
+import numpy as np
+
+price_keys = re.compile('^(?:(?:vcpus|memory)_)?(?:od|spot|cud1y|cud3y)$')
+
+
+# prices are stored hourly, a copy with them multiplied by the hours in the
+# quoted period
+def priced(item:dict, multiplier:float) -> dict:
+    if item is None or multiplier == 1:
+        return item
+    return {
+        key: value * multiplier if price_keys.match(key) and not value is None else value
+        for key, value in item.items()
+    }
+
+
+class PredefinedIndex:
+    def __init__(self, predefined:list, region:str, shapes:list=None, multiplier:float=1) -> None:
+        self.region = region
+        if shapes is None:
+            shapes = self.prune(sorted(
+                [item for item in predefined if item["region"] == region],
+                key=itemgetter('od')
+            ))
+        self.shapes = shapes
+        self.priced = [priced(shape, multiplier) for shape in shapes]
+        self.cpus = np.array([shape["cpus"] for shape in self.shapes], dtype=float)
+        self.memory = np.array([shape["memory"] for shape in self.shapes], dtype=float)
+        self.lookups = {}
+
+    # a shape is never the cheapest option if an earlier (cheaper or equally
+    # priced, but listed first) shape has at least as many cpus and memory.
+    @staticmethod
+    def prune(shapes:list) -> list:
+        frontier = []
+        for shape in shapes:
+            if not any(
+                kept["cpus"] >= shape["cpus"] and kept["memory"] >= shape["memory"]
+                for kept in frontier
+            ):
+                frontier.append(shape)
+        return frontier
+
+    def find(self, cpu:int, mem:int) -> dict:
+        key = (cpu, mem)
+        if not key in self.lookups:
+            self.lookups[key] = next((self.priced[index] for index, shape in enumerate(self.shapes) if (
+                shape["cpus"] >= cpu and
+                shape["memory"] >= mem
+            )), None)
+        return self.lookups[key]
+
+    # index into self.shapes (and self.priced) of the cheapest shape for each (cpu, mem) pair, -1 when none fits
+    def find_batch(self, cpu:np.ndarray, mem:np.ndarray) -> np.ndarray:
+        if len(self.shapes) == 0:
+            return np.full(len(cpu), -1)
+        fits = (self.cpus[None, :] >= cpu[:, None]) & (self.memory[None, :] >= mem[:, None])
+        return np.where(fits.any(axis=1), fits.argmax(axis=1), -1)
+
+
+class CustomIndex:
+    commits = ['od', 'spot', 'cud1y', 'cud3y']
+
+    def __init__(self, custom:list, region:str, multiplier:float=1) -> None:
+        self.region = region
+        families = [priced(item, multiplier) for item in custom if item["region"] == region]
+        self.names = [family["name"] for family in families]
+        self.cpu_min = [family["cpu_min"] for family in families]
+        self.cpu_max = [family["cpu_max"] for family in families]
+        self.memory_min = [family["memory_min"] for family in families]
+        self.memory_max = [family["memory_max"] for family in families]
+        self.vcpus = {
+            commit: [family.get(f"vcpus_{commit}") for family in families]
+            for commit in self.commits
+        }
+        self.memory = {
+            commit: [family.get(f"memory_{commit}") for family in families]
+            for commit in self.commits
+        }
+        self.arrays = {
+            name: np.array(values, dtype=float)
+            for name, values in [
+                ("cpu_min", self.cpu_min),
+                ("cpu_max", self.cpu_max),
+                ("memory_min", self.memory_min),
+                ("memory_max", self.memory_max)
+            ]
+        }
+
+    def find(self, cpu:int, mem:int, cud:bool=False) -> dict:
+        key = 'cud1y' if cud else 'od'
+        vcpus_price = self.vcpus[key]
+        memory_price = self.memory[key]
+        best, best_price, best_cpu, best_mem = None, None, None, None
+        for index in range(len(self.names)):
+            if vcpus_price[index] is None or memory_price[index] is None:
+                continue
+            family_cpu = int(max(cpu, self.cpu_min[index]))
+            family_mem = int(max(mem, math.ceil(family_cpu*self.memory_min[index])))
+            if self.cpu_max[index] < family_cpu or self.memory_max[index] < family_mem / family_cpu:
+                continue
+            price = round(vcpus_price[index]*family_cpu + memory_price[index]*family_mem, 2)
+            if best_price is None or price < best_price:
+                best, best_price, best_cpu, best_mem = index, price, family_cpu, family_mem
+        if best is None:
+            return None
+        return self.shape(best, best_cpu, best_mem)
+
+    # cheapest family index and its shape for each (cpu, mem) pair, -1 when none fits
+    def find_batch(self, cpu:np.ndarray, mem:np.ndarray, cud:bool=False):
+        if len(self.names) == 0:
+            return np.full(len(cpu), -1), cpu, mem
+        key = 'cud1y' if cud else 'od'
+        vcpus_price = np.array([np.nan if price is None else price for price in self.vcpus[key]], dtype=float)
+        memory_price = np.array([np.nan if price is None else price for price in self.memory[key]], dtype=float)
+        family_cpu = np.maximum(cpu[:, None], self.arrays["cpu_min"][None, :]).astype(np.int64)
+        family_mem = np.maximum(mem[:, None], np.ceil(family_cpu*self.arrays["memory_min"][None, :])).astype(np.int64)
+        prices = np.round(vcpus_price[None, :]*family_cpu + memory_price[None, :]*family_mem, 2)
+        valid = (
+            (self.arrays["cpu_max"][None, :] >= family_cpu) &
+            (self.arrays["memory_max"][None, :] >= family_mem / family_cpu) &
+            ~np.isnan(prices)
+        )
+        prices = np.where(valid, prices, np.inf)
+        best = prices.argmin(axis=1)
+        rows = np.arange(len(cpu))
+        return np.where(valid.any(axis=1), best, -1), family_cpu[rows, best], family_mem[rows, best]
+
+    def shape(self, index:int, cpu:int, mem:int) -> dict:
+        shape = {
+            "family": self.names[index],
+            'name': "%s-custom-%s-%s" % (self.names[index], cpu, mem),
+            "cpus": cpu,
+            "memory": mem,
+            "region": self.region,
+            'spot': self.price(index, 'spot', cpu, mem)
+        }
+        for commit in ['od', 'cud1y', 'cud3y']:
+            price = self.price(index, commit, cpu, mem)
+            shape[commit] = None if price is None else round(price, 2)
+        return shape
+
+    def price(self, index:int, commit:str, cpu:int, mem:int) -> float:
+        vcpus_price = self.vcpus[commit][index]
+        memory_price = self.memory[commit][index]
+        if vcpus_price is None or memory_price is None:
+            return None
+        return vcpus_price*cpu + memory_price*mem
@@ -2,6 +2,7 @@ from pricing import GenericTable
 from pricing import BaseTable
 from pricing import DiskTable
 from pricing import PredefinedTable
+import ast
 import json
 import re
 
@@ -44,8 +45,38 @@ predefined_types_base_ids = [
 ]
 """
 
+# fixes for errors in the provided layouts, the quotes and booleans turning
+# the python literal into json. str.replace returns the very same string when
+# there is nothing to replace, so fixes that do not apply cost a scan only.
+literal_fixes = (
+    ("'", '"'),
+    ("True", "true"),
+    ("False", "false")
+)
+text_fixes = (
+    (" (USD)", ""),
+    ("-year", " year"),
+    ("GB", "")
+)
+
+def fix(text:str, fixes) -> str:
+    for old, new in fixes:
+        text = text.replace(old, new)
+    return text
+
+# json is by far the fastest to load, but swapping the quotes breaks texts
+# holding an apostrophe; those layouts are read as the python literal they are
+def load_layout(layout:str) -> dict:
+    text = fix(layout, text_fixes)
+    try:
+        return json.loads(fix(text, literal_fixes))
+    except ValueError:
+        return ast.literal_eval(text)
+
+
 class TableFactory:
-    def from_data(data, period, json_data) -> GenericTable:
+    # id is the one of the heading preceding the table, layout its raw layout attribute
+    def from_data(id, layout, json_data) -> GenericTable:
         ignored_frames = [
             "n1_extendedmemory",
             "n2_extendedmemory",
@@ -63,25 +94,13 @@ class TableFactory:
         ]
 
 
-        id =  next(iter([sibling['id'] for sibling in data.find_previous_siblings() if (
-            sibling.name in ['h3', 'h4'] 
-        )] or []), None)
-
-        if id is None or id in ignored_frames:
+        if id is None or layout is None or id in ignored_frames:
             return None
 
-        #fixes for error in provided json
-        rows = json.loads(
-            data.get('layout').replace("\'", "\"")
-            .replace("True", "true")
-            .replace("False", "false")
-            .replace(" (USD)", "")
-            .replace("-year", " year")
-            .replace("GB", "")
-        )["rows"]
+        rows = load_layout(layout)["rows"]
 
         if id == "persistentdisk":
-            return DiskTable(rows, json_data, period)
+            return DiskTable(rows, json_data)
 
         if id in ["larger_ultramem", "megamem"]:
             family_name = "m1"
@@ -97,8 +116,8 @@ class TableFactory:
 
 
         if (rows[0]['cells'][0] == "Machine type"):
-            return PredefinedTable(rows, family_name, period)
+            return PredefinedTable(rows, family_name)
         elif (rows[0]['cells'][0] == "Item"):
-            return BaseTable(rows, family_name, period, id_parts.group(2))
+            return BaseTable(rows, family_name, id_parts.group(2))
         else:
             return None
\ No newline at end of file
@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+from collections import Counter
+from time import perf_counter
+
+project = os.path.dirname(os.path.abspath(__file__))
+
+
+# Sampling profiler for --profile. A thread takes the stack of the main
+# thread every few milliseconds, so the pipeline runs at close to its usual
+# speed. The stacks are written collapsed, one per line with their count,
+# ready for flamegraph.pl or speedscope, along with a summary of the time
+# spent in the project's own functions. Worker processes are not sampled.
+class Profiler:
+    def __init__(self, interval:float=0.005) -> None:
+        self.interval = interval
+        self.stacks = Counter()
+        self.labels = {}
+        self.project_code = set()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.target = None
+        self.elapsed = 0
+
+    def start(self) -> "Profiler":
+        self.target = threading.get_ident()
+        self.started = perf_counter()
+        self.thread = threading.Thread(target=self.sample, name="profiler", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> "Profiler":
+        self.stopped.set()
+        self.thread.join()
+        self.elapsed = perf_counter() - self.started
+        return self
+
+    def label(self, code) -> str:
+        if not code in self.labels:
+            path = os.path.abspath(code.co_filename)
+            name = getattr(code, "co_qualname", code.co_name)
+            if path.startswith(project + os.sep):
+                self.project_code.add(code)
+                path = os.path.relpath(path, project)
+            else:
+                path = os.path.basename(path)
+            self.labels[code] = f"{path}:{name}"
+        return self.labels[code]
+
+    def sample(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while not frame is None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+    # time by project function: inclusive counts every sample it is on the
+    # stack, own the samples where it is the innermost project function,
+    # the libraries it calls (openpyxl, bs4...) included, which are also
+    # broken down by the first library function called
+    def summary(self, top:int=20) -> str:
+        total = sum(self.stacks.values())
+        inclusive = Counter()
+        own = Counter()
+        calls = Counter()
+        for stack, count in self.stacks.items():
+            labels = [self.label(code) for code in stack]
+            project_labels = [index for index, code in enumerate(stack) if code in self.project_code]
+            for label in set(labels[index] for index in project_labels):
+                inclusive[label] += count
+            if len(project_labels) > 0:
+                innermost = project_labels[-1]
+                own[labels[innermost]] += count
+                if innermost + 1 < len(labels):
+                    calls[f"{labels[innermost]} > {labels[innermost + 1]}"] += count
+
+        # samples are skipped while the main thread holds the GIL, so they
+        # are scaled to the elapsed time rather than counted as intervals
+        seconds = self.elapsed / max(total, 1)
+        lines = [f"{total} samples over {self.elapsed:.2f}s", ""]
+        for title, counts in [("own", own), ("inclusive", inclusive), ("library calls", calls)]:
+            lines.append(f"{'%':>6} {'seconds':>8}  {title}")
+            for label, count in counts.most_common(top):
+                lines.append(f"{count/max(total, 1)*100:6.1f} {count*seconds:8.2f}  {label}")
+            lines.append("")
+        return "\n".join(lines)
+
+    # writes <prefix>.folded and <prefix>.txt
+    def write(self, prefix:str) -> None:
+        with open(f"{prefix}.folded", "w") as folded:
+            for stack, count in self.stacks.most_common():
+                folded.write(";".join(self.label(code) for code in stack) + f" {count}\n")
+        text = self.summary()
+        with open(f"{prefix}.txt", "w") as summary:
+            summary.write(text)
+        print(text)
+        print(f"profile written to {prefix}.folded and {prefix}.txt")
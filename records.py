@@ -0,0 +1,82 @@
+import csv
+import json
+
+# one record per vm and region, and one per region and commit for the totals
+fields = [
+    'record', 'book', 'row', 'vm', 'cpus', 'memory', 'disk', 'os',
+    'region', 'commit',
+    'od_shape', 'od', 'cud_shape', 'cud1y', 'cud3y', 'license',
+    'standard', 'balanced', 'ssd', 'gcve'
+]
+
+formats = ['json', 'jsonl', 'csv']
+
+
+# priced rows are laid out as in the book sheets: the vm columns, then ten
+# columns per region
+def vm_records(book_name:str, row_index:int, data:list, regions:list):
+    [vm, cpus, memory, disk, os] = data[:5]
+    for region_index, region in enumerate(regions):
+        start = 5 + (region_index*10)
+        [od_shape, od, cud_shape, cud1y, cud_shape, cud3y, license, standard, balanced, ssd] = data[start:start+10]
+        yield {
+            'record': 'vm',
+            'book': book_name,
+            'row': row_index,
+            'vm': vm,
+            'cpus': cpus,
+            'memory': memory,
+            'disk': disk,
+            'os': os,
+            'region': region,
+            'od_shape': od_shape,
+            'od': od,
+            'cud_shape': cud_shape,
+            'cud1y': cud1y,
+            'cud3y': cud3y,
+            'license': license,
+            'standard': standard,
+            'balanced': balanced,
+            'ssd': ssd
+        }
+
+
+def total_record(region:str, commit:str, ssd:float, balanced:float, standard:float, gcve:float) -> dict:
+    return {
+        'record': 'total',
+        'region': region,
+        'commit': commit,
+        'standard': standard,
+        'balanced': balanced,
+        'ssd': ssd,
+        'gcve': gcve
+    }
+
+
+# records are written as they come: a json array, json lines or csv rows
+# with every field as a column
+class RecordWriter:
+    def __init__(self, path:str, format:str) -> None:
+        self.format = format
+        self.file = open(path, 'w', newline='' if format == 'csv' else None)
+        self.count = 0
+        self.writer = None
+        if format == 'csv':
+            self.writer = csv.DictWriter(self.file, fieldnames=fields)
+            self.writer.writeheader()
+        elif format == 'json':
+            self.file.write('[')
+
+    def write(self, record:dict) -> None:
+        if self.format == 'csv':
+            self.writer.writerow(record)
+        elif self.format == 'json':
+            self.file.write(('\n' if self.count == 0 else ',\n') + json.dumps(record))
+        else:
+            self.file.write(json.dumps(record) + '\n')
+        self.count += 1
+
+    def close(self) -> None:
+        if self.format == 'json':
+            self.file.write('\n]\n')
+        self.file.close()
@@ -0,0 +1,279 @@
+#!/bin/bash
+"exec" "$(dirname $0)/env/bin/python3" "$0" "$@"
+
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import traceback
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from pricing import PriceList, parse_args
+from util import ColumnTotals
+from records import vm_records, total_record
+import estimate_rvtools
+import telemetry
+
+# uploaded vInfo files are kept in memory while they are received
+max_body = 256 * 1024 * 1024
+
+
+# The price list is loaded once and shared by the request threads, which
+# only read it. A refresh builds a new one aside and swaps it in between
+# requests, so each request is priced with a single list.
+class Prices:
+    def __init__(self, price_list) -> None:
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.swapping = False
+        self.set(price_list)
+
+    def set(self, price_list) -> None:
+        self.price_list = price_list
+        # the pricing functions of the estimate read the module's price list
+        estimate_rvtools.price_list = price_list
+
+    @contextmanager
+    def reading(self):
+        with self.condition:
+            self.condition.wait_for(lambda: not self.swapping)
+            self.readers += 1
+        try:
+            yield self.price_list
+        finally:
+            with self.condition:
+                self.readers -= 1
+                self.condition.notify_all()
+
+    def swap(self, price_list) -> None:
+        with self.condition:
+            self.swapping = True
+            self.condition.wait_for(lambda: self.readers == 0)
+            self.set(price_list)
+            self.swapping = False
+            self.condition.notify_all()
+
+
+# reloads the prices every interval, revalidating the downloaded documents
+def refresh(prices, args, stopped) -> None:
+    while not stopped.wait(args.refresh * 60):
+        try:
+            with telemetry.span("refresh"):
+                price_list = PriceList(args.regions, args.period, True, args.local)
+            prices.swap(price_list)
+            print(f"prices refreshed, {price_list.count()}")
+        except Exception as e:
+            print("WARNING! price refresh failed: %s" % traceback.format_exc())
+
+
+class RequestError(Exception):
+    def __init__(self, status:int, message:str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+# a vm of a request: cpus, memory and disk in GB, the os name as RVTools
+# reports it
+def read_vm(vm:dict, index:int) -> list:
+    try:
+        cpus = float(vm["cpus"])
+        memory = float(vm["memory"])
+        disk = float(vm.get("disk") or 10)
+    except (KeyError, TypeError, ValueError) as e:
+        raise RequestError(400, f"vm {index}: cpus and memory are required numbers ({e})")
+    if cpus <= 0 or memory <= 0:
+        raise RequestError(400, f"vm {index}: cpus and memory must be positive")
+    return [str(vm.get("name", index)), cpus, memory*1024, max(10, disk), vm.get("os")]
+
+
+def read_regions(value, price_list) -> list:
+    if value is None:
+        return price_list.regions
+    regions = value.split(",") if isinstance(value, str) else list(value)
+    missing = [region for region in regions if not region in price_list.regions]
+    if len(missing) > 0:
+        raise RequestError(400, f"regions not loaded: {', '.join(missing)}")
+    return regions
+
+
+# the records of --format json: one per vm and region, then the totals of
+# the vms priced; vms no machine type fits are reported as errors
+def quote(book_name:str, rows:list, regions:list) -> dict:
+    quotes = estimate_rvtools.price_vms([vm for row_index, vm in rows], regions)
+    totals = ColumnTotals()
+    records = []
+    errors = []
+    for index, (row_index, vm) in enumerate(rows):
+        try:
+            data = estimate_rvtools.vm_row(vm, regions, {key: region_quotes[index] for key, region_quotes in quotes.items()})
+        except Exception as e:
+            errors.append({"vm": vm[0], "error": str(e)})
+            continue
+        totals.update(data)
+        records.extend(vm_records(book_name, row_index, data, regions))
+
+    book = {"totals": totals}
+    for region_index, region_name in enumerate(regions):
+        values = estimate_rvtools.get_book_values(book, region_index, region_name)
+        for commit in [1,3,5]:
+            records.append(total_record(region_name, estimate_rvtools.commits_name[commit], *values[commit]))
+    return {"records": records, "errors": errors}
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # unix socket clients have no address
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def send_json(self, status:int, body) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        # a body left unread would be parsed as the next request of the
+        # connection, so it is closed instead
+        if not self.body_read and (self.headers.get("Content-Length", "0").strip() != "0" or "Transfer-Encoding" in self.headers):
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self) -> bytes:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise RequestError(400, "invalid Content-Length")
+        if length > max_body:
+            raise RequestError(413, f"body over {max_body} bytes")
+        body = self.rfile.read(length)
+        self.body_read = True
+        return body
+
+    def read_json(self):
+        try:
+            return json.loads(self.read_body() or b"{}")
+        except ValueError as e:
+            raise RequestError(400, f"invalid json: {e}")
+
+    def handle_request(self, method:str) -> None:
+        self.body_read = False
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        routes = {
+            ("GET", "/health"): self.health,
+            ("POST", "/quote"): self.quote,
+            ("POST", "/batch"): self.batch,
+            ("POST", "/vinfo"): self.vinfo,
+        }
+        route = routes.get((method, url.path))
+        try:
+            if route is None:
+                raise RequestError(404, f"no {method} {url.path}")
+            with telemetry.span("serve" + url.path.replace("/", "."), method=method):
+                with self.server.prices.reading() as price_list:
+                    self.send_json(200, route(price_list, query))
+        except RequestError as e:
+            self.send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            traceback.print_exc()
+            self.send_json(500, {"error": str(e)})
+
+    def do_GET(self) -> None:
+        self.handle_request("GET")
+
+    def do_POST(self) -> None:
+        self.handle_request("POST")
+
+    def health(self, price_list, query) -> dict:
+        return {
+            "regions": price_list.regions,
+            "period": price_list.period,
+            "updated": str(price_list.last_update),
+            "prices": price_list.count()
+        }
+
+    # {"cpus": 4, "memory": 16, "disk": 100, "os": "...", "regions": [...]}
+    def quote(self, price_list, query) -> dict:
+        vm = self.read_json()
+        regions = read_regions(vm.get("regions", query.get("regions")), price_list)
+        result = quote("quote", [(0, read_vm(vm, 0))], regions)
+        if len(result["errors"]) > 0:
+            raise RequestError(422, result["errors"][0]["error"])
+        return result
+
+    # {"vms": [{"name": ..., "cpus": ..., "memory": ...}, ...], "regions": [...]}
+    def batch(self, price_list, query) -> dict:
+        body = self.read_json()
+        regions = read_regions(body.get("regions", query.get("regions")), price_list)
+        vms = [(index, read_vm(vm, index)) for index, vm in enumerate(body.get("vms") or [])]
+        return quote(body.get("name", "batch"), vms, regions)
+
+    # the body is an RVTools export as uploaded, ?name= gives its file name
+    # (and format: xlsx, csv or parquet), ?optimization= the cpu optimization %
+    def vinfo(self, price_list, query) -> dict:
+        regions = read_regions(query.get("regions"), price_list)
+        name = os.path.basename(query.get("name", "vinfo.xlsx"))
+        try:
+            optimization = 1 - (float(query.get("optimization", 0))/100)
+        except ValueError:
+            raise RequestError(400, "optimization must be a number")
+        body = self.read_body()
+        with tempfile.TemporaryDirectory(prefix="rvtools-") as directory:
+            path = os.path.join(directory, name)
+            with open(path, "wb") as upload:
+                upload.write(body)
+            try:
+                errors, vms = estimate_rvtools.read_book(path, optimization, False)
+            except Exception as e:
+                raise RequestError(400, f"unreadable vInfo file: {e}")
+        if len(errors) > 0:
+            raise RequestError(400, "; ".join(errors))
+        # rows keep their index in the sheet, as in the records of the estimate
+        return quote(name, vms, regions)
+
+
+# the default backlog of 5 resets connections under bursts of clients
+class QuoteServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+class UnixQuoteServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def create_server(args, prices):
+    if args.socket is None:
+        server = QuoteServer((args.host, args.port), QuoteHandler)
+        address = f"http://{args.host}:{server.server_port}"
+    else:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixQuoteServer(args.socket, QuoteHandler)
+        address = f"unix:{args.socket}"
+    server.prices = prices
+    return server, address
+
+
+if (__name__=="__main__"):
+    args = parse_args(serve=True)
+    telemetry.configure(args.telemetry, "serve")
+    prices = Prices(PriceList(args.regions, args.period, args.nocache, args.local))
+    server, address = create_server(args, prices)
+
+    stopped = threading.Event()
+    if args.refresh > 0:
+        threading.Thread(target=refresh, args=(prices, args, stopped), name="refresh", daemon=True).start()
+    print(f"serving quotes on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        server.server_close()
+        if not args.socket is None and os.path.exists(args.socket):
+            os.remove(args.socket)
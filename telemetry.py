@@ -0,0 +1,90 @@
+import atexit
+import sys
+
+# Spans and counters around the stages of the estimate, exported through
+# OpenTelemetry once configured. Until then nothing is imported, span()
+# hands back a shared no-op span and count() returns right away, so the
+# instrumented code pays a function call per stage when it is disabled.
+exporters = ['console', 'gcp', 'jaeger']
+
+tracer = None
+meter = None
+counters = {}
+
+
+class NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key, value) -> None:
+        pass
+
+no_span = NoSpan()
+
+
+def enabled() -> bool:
+    return not tracer is None
+
+
+# exporter is console, gcp, jaeger or the path of a file the spans and
+# metrics are appended to as json; console and files work offline
+def configure(exporter:str=None, service_name:str="rvtools") -> None:
+    global tracer, meter
+    if exporter is None:
+        return
+
+    from opentelemetry import trace, metrics
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader, ConsoleMetricExporter
+
+    if exporter == 'gcp':
+        from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+        from opentelemetry.exporter.cloud_monitoring import CloudMonitoringMetricsExporter
+        span_exporter, metric_exporter = CloudTraceSpanExporter(), CloudMonitoringMetricsExporter()
+    elif exporter == 'jaeger':
+        # jaeger only takes traces, the metrics go to the console
+        from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+        span_exporter, metric_exporter = JaegerExporter(), ConsoleMetricExporter(out=sys.stderr)
+    else:
+        out = sys.stderr if exporter == 'console' else open(exporter, 'a')
+        span_exporter, metric_exporter = ConsoleSpanExporter(out=out), ConsoleMetricExporter(out=out)
+
+    resource = Resource.create({"service.name": service_name})
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(tracer_provider)
+    # metrics are read once, when the process ends
+    meter_provider = MeterProvider(
+        resource=resource,
+        metric_readers=[PeriodicExportingMetricReader(metric_exporter, export_interval_millis=float('inf'))]
+    )
+    metrics.set_meter_provider(meter_provider)
+
+    def shutdown():
+        tracer_provider.shutdown()
+        meter_provider.force_flush()
+        meter_provider.shutdown()
+    atexit.register(shutdown)
+
+    tracer = trace.get_tracer("rvtools")
+    meter = metrics.get_meter("rvtools")
+
+
+def span(name:str, **attributes):
+    if tracer is None:
+        return no_span
+    return tracer.start_as_current_span(name, attributes={key: value for key, value in attributes.items() if not value is None})
+
+
+def count(name:str, value:int=1, **attributes) -> None:
+    if meter is None:
+        return
+    if not name in counters:
+        counters[name] = meter.create_counter(name)
+    counters[name].add(value, attributes)
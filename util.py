@@ -1,17 +1,47 @@
 from __future__ import annotations
-import openpyxl
+from copy import copy
+import importlib.util
+import sys
+import weakref
 
-class CellFormat:
-    thin = openpyxl.styles.Side(border_style="thin", color="000000")
-    thin_border = openpyxl.styles.Border(top=thin, left=thin, right=thin, bottom=thin)
+# the module is only loaded on the first access to one of its attributes
+def lazy_import(name:str):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+# openpyxl is only needed once a workbook is written
+openpyxl = lazy_import('openpyxl')
 
-    bold_font = openpyxl.styles.Font(bold=True)
+class CellFormat:
+    # the openpyxl styles are created with the first format applied
+    thin = None
+    thin_border = None
+    bold_font = None
     colors = {}
-    alignment = openpyxl.styles.alignment.Alignment(horizontal="center", vertical="center")
+    alignment = None
     currency_format = '[$$-409]#,##0.00'
     gb_format = '0.0 "GB"'    
     tb_format = '0.0 "TB"'
-    sheet = openpyxl.worksheet.worksheet.Worksheet(None)
+    percent_format = '0.0%'
+    sheet = None
+
+    # named styles registered so far, per workbook and per format key
+    registered = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def create_styles(cls) -> None:
+        if cls.thin is None:
+            cls.thin = openpyxl.styles.Side(border_style="thin", color="000000")
+            cls.thin_border = openpyxl.styles.Border(top=cls.thin, left=cls.thin, right=cls.thin, bottom=cls.thin)
+            cls.bold_font = openpyxl.styles.Font(bold=True)
+            cls.alignment = openpyxl.styles.alignment.Alignment(horizontal="center", vertical="center")
 
     def get_color(self, color: str):
         if not color in self.colors:
@@ -26,19 +56,24 @@ class CellFormat:
         self.is_currency = False
         self.is_gb = False
         self.is_tb = False
+        self.is_percent = False
         self.fill_color = None
+        self.color_name = None
         self.data = None
+        self.workbook = None
+        self.style = None
         if not sheet is None:
             self.sheet = sheet
 
     def border(self, color:str="000000") -> CellFormat:
         self.has_border = True
-        return self
+        return self.changed()
 
     def color(self, color:str) -> CellFormat:
         if not color is None:
             self.fill_color = self.get_color(color)
-        return self
+            self.color_name = color
+        return self.changed()
 
     def value(self, value:str) -> CellFormat:
         cell = openpyxl.cell.cell.Cell(self.sheet, column=1, row=1, value=value)
@@ -46,58 +81,110 @@ class CellFormat:
 
     def center(self) -> CellFormat:
         self.is_centered = True
-        return self
+        return self.changed()
 
     def bold(self) -> CellFormat:
         self.is_bold = True
-        return self
+        return self.changed()
 
     def currency(self) -> CellFormat:
         self.is_currency = True
         self.is_gb = False
         self.is_tb = False
-        return self
+        self.is_percent = False
+        return self.changed()
 
     def gb(self) -> CellFormat:
         self.is_currency = False
         self.is_gb = True
         self.is_tb = False
-        return self
+        self.is_percent = False
+        return self.changed()
 
     def tb(self) -> CellFormat:
         self.is_currency = False
         self.is_gb = False
         self.is_tb = True
-        return self
+        self.is_percent = False
+        return self.changed()
+
+    def percent(self) -> CellFormat:
+        self.is_currency = False
+        self.is_gb = False
+        self.is_tb = False
+        self.is_percent = True
+        return self.changed()
 
     def header(self, color:str=None) -> CellFormat:
         return self.border().bold().center().color(color)
 
-    def apply(self, cell):
+    def changed(self) -> CellFormat:
+        self.workbook = None
+        self.style = None
+        return self
+
+    def key(self) -> str:
+        return "-".join(["rvtools"] + [name for name, enabled in [
+            ("bold", self.is_bold),
+            ("border", self.has_border),
+            ("center", self.is_centered),
+            (f"fill_{self.color_name}", not self.fill_color is None),
+            ("currency", self.is_currency),
+            ("gb", self.is_gb),
+            ("tb", self.is_tb),
+            ("percent", self.is_percent)
+        ] if enabled])
+
+    def format(self, target):
+        self.create_styles()
         if (self.is_bold):
-            cell.font = self.bold_font
+            target.font = self.bold_font
 
         if (self.has_border):
-            cell.border = self.thin_border
+            target.border = self.thin_border
 
         if self.is_centered:
-            cell.alignment = self.alignment
+            target.alignment = self.alignment
 
         if not self.fill_color is None:
-            cell.fill = self.fill_color
+            target.fill = self.fill_color
 
         if self.is_currency:
-            cell.number_format = self.currency_format
+            target.number_format = self.currency_format
 
         if self.is_gb:
-            cell.number_format = self.gb_format
+            target.number_format = self.gb_format
 
         if self.is_tb:
-            cell.number_format = self.tb_format
+            target.number_format = self.tb_format
+
+        if self.is_percent:
+            target.number_format = self.percent_format
+        return target
 
-        # if not self.value is None:
-        #     cell.value = self.data
+    # each format is registered once per workbook as a named style and its
+    # style ids are kept, so styling a cell is a copy of those ids
+    def get_style(self, cell):
+        workbook = cell.parent.parent
+        if not self.workbook is workbook:
+            styles = self.registered.setdefault(workbook, {})
+            key = self.key()
+            if not key in styles:
+                style = None
+                if key != "rvtools":
+                    named_style = self.format(openpyxl.styles.NamedStyle(name=key))
+                    workbook.add_named_style(named_style)
+                    style = copy(self.format(openpyxl.cell.cell.Cell(cell.parent))._style)
+                    style.xfId = named_style.as_tuple().xfId
+                styles[key] = style
+            self.workbook = workbook
+            self.style = styles[key]
+        return self.style
 
+    def apply(self, cell):
+        style = self.get_style(cell)
+        if not style is None:
+            cell._style = copy(style)
         return cell
 
     def generator(self, row):
@@ -105,8 +192,98 @@ class CellFormat:
             yield self.apply(
                 openpyxl.cell.cell.Cell(
                     self.sheet, 
-                    column="A", 
+                    column=1, 
                     row=1, 
                     value=value
                 )
-            )
\ No newline at end of file
+            )
+
+
+class StreamingSheet:
+    # merges only ever span the last few appended rows, so rows are held back
+    # this long to give merged ranges their outline before being streamed out
+    pending_rows = 8
+
+    def __init__(self, sheet) -> None:
+        self.sheet = sheet
+        self.max_row = 0
+        self.current_row = 0
+        self.pending = []
+
+    def __getattr__(self, name):
+        return getattr(self.sheet, name)
+
+    def append(self, row) -> None:
+        row = list(row)
+        self.current_row += 1
+        if any(not value is None for value in row):
+            self.max_row = self.current_row
+        self.pending.append((self.current_row, row))
+        if len(self.pending) > self.pending_rows:
+            self.sheet.append(self.pending.pop(0)[1])
+
+    def merge_cells(self, start_row, start_column, end_row, end_column) -> None:
+        self.sheet.merged_cells.add(openpyxl.worksheet.cell_range.CellRange(
+            min_col=start_column, min_row=start_row, max_col=end_column, max_row=end_row
+        ))
+        rows = {row_index: row for row_index, row in self.pending}
+        if not start_row in rows:
+            return
+        start = rows[start_row][start_column-1] if len(rows[start_row]) >= start_column else None
+        border = getattr(start, "border", None)
+        for row_index in range(start_row, end_row + 1):
+            row = rows.get(row_index)
+            if row is None:
+                continue
+            row.extend([None] * (end_column - len(row)))
+            for column in range(start_column, end_column + 1):
+                if row_index == start_row and column == start_column:
+                    continue
+                cell = openpyxl.cell.cell.Cell(self, column=column, row=row_index)
+                if not border is None:
+                    cell.border = openpyxl.styles.Border(
+                        left=border.left if column == start_column else None,
+                        right=border.right if column == end_column else None,
+                        top=border.top if row_index == start_row else None,
+                        bottom=border.bottom if row_index == end_row else None
+                    )
+                row[column-1] = cell
+
+    def flush(self) -> None:
+        for row_index, row in self.pending:
+            self.sheet.append(row)
+        self.pending = []
+
+
+# running sums of the numeric cells of each column, as SUM would add them up
+class ColumnTotals:
+    def __init__(self) -> None:
+        self.totals = {}
+
+    def update(self, row) -> None:
+        for index, value in enumerate(row, 1):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.totals[index] = self.totals.get(index, 0) + value
+
+    def get(self, index:int) -> float:
+        return self.totals.get(index, 0)
+
+
+class ColumnWidths:
+    def __init__(self) -> None:
+        self.widths = {}
+
+    def update(self, row) -> None:
+        for index, value in enumerate(row, 1):
+            value = getattr(value, "value", value)
+            length = len(str(value))
+            if length > self.widths.get(index, 0):
+                self.widths[index] = length
+
+    @property
+    def max_column(self) -> int:
+        return max(self.widths, default=0)
+
+    def get(self, index:int) -> int:
+        # empty and merged cells are measured as 'None' by openpyxl
+        return max(len(str(None)), self.widths.get(index, 0))
@@ -0,0 +1,237 @@
+import csv
+import os
+import posixpath
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+number = re.compile('^-?[0-9]+(\\.[0-9]*)?([eE][-+]?[0-9]+)?$')
+relationship_ns = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+dimension = re.compile('<(?:\\w+:)?dimension ref="[A-Z]+[0-9]+:?[A-Z]*([0-9]+)?"')
+
+
+def local_name(tag:str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def column_index(letters:str) -> int:
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def cast_number(value:str):
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+# streams the vInfo sheet straight from the xlsx package, materializing only
+# the requested columns instead of an openpyxl cell for every column
+class VInfoReader:
+    def __init__(self, book_name:str, columns:list, sheet_name:str='vInfo') -> None:
+        self.book_name = book_name
+        self.columns = columns
+        self.archive = zipfile.ZipFile(book_name)
+        self.sheet_path = None
+        self.strings_path = None
+        self.shared_strings = []
+        self.header = None
+        self.max_row = None
+        self.find_parts(sheet_name)
+        if self.has_sheet:
+            self.max_row = self.read_dimension()
+
+    @property
+    def has_sheet(self) -> bool:
+        return not self.sheet_path is None
+
+    def close(self) -> None:
+        self.archive.close()
+
+    def find_parts(self, sheet_name:str) -> None:
+        targets = {}
+        with self.archive.open('xl/_rels/workbook.xml.rels') as rels:
+            for event, element in iterparse(rels):
+                if local_name(element.tag) == 'Relationship':
+                    target = element.get('Target')
+                    target = target[1:] if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+                    targets[element.get('Id')] = target
+                    if element.get('Type', '').endswith('/sharedStrings'):
+                        self.strings_path = target
+
+        with self.archive.open('xl/workbook.xml') as workbook:
+            for event, element in iterparse(workbook):
+                if local_name(element.tag) == 'sheet' and element.get('name') == sheet_name:
+                    self.sheet_path = targets.get(element.get(relationship_ns))
+
+    def load_shared_strings(self) -> None:
+        if self.strings_path is None or self.strings_path not in self.archive.namelist():
+            return
+        with self.archive.open(self.strings_path) as strings:
+            for event, element in iterparse(strings):
+                if local_name(element.tag) != 'si':
+                    continue
+                self.shared_strings.append(self.text(element))
+                element.clear()
+
+    # rich text is split in runs, phonetic hints are not part of the value
+    def text(self, string) -> str:
+        text = []
+        for child in string:
+            tag = local_name(child.tag)
+            if tag == 't':
+                text.append(child.text or '')
+            elif tag == 'r':
+                text.extend(run.text or '' for run in child if local_name(run.tag) == 't')
+        return ''.join(text)
+
+    # the dimension sits at the top of the sheet part, ahead of the rows
+    def read_dimension(self):
+        with self.archive.open(self.sheet_path) as sheet:
+            match = dimension.search(sheet.read(4096).decode('utf-8', 'ignore'))
+        return int(match.group(1)) if match and match.group(1) else None
+
+    def cell_value(self, cell):
+        kind = cell.get('t', 'n')
+        value = None
+        for child in cell:
+            tag = local_name(child.tag)
+            if tag == 'v':
+                value = child.text
+            elif tag == 'is':
+                return self.text(child)
+        if value is None:
+            return None
+        if kind == 's':
+            return self.shared_strings[int(value)]
+        if kind == 'n':
+            return cast_number(value)
+        if kind == 'b':
+            return value == '1'
+        if kind == 'e':
+            return None
+        return value
+
+    # yields (row index, tuple with the requested columns), row 0 being the header
+    def rows(self):
+        self.load_shared_strings()
+        wanted = None
+        expected_row = 0
+        with self.archive.open(self.sheet_path) as sheet:
+            for event, element in iterparse(sheet):
+                if not element.tag.endswith('}row'):
+                    continue
+                row_index = int(element.get('r', expected_row + 1)) - 1
+                values = {}
+                column = -1
+                for cell in element:
+                    reference = cell.get('r')
+                    if reference is None:
+                        column += 1
+                    else:
+                        column = column_index(reference.rstrip('0123456789'))
+                    if wanted is None or column in wanted:
+                        values[column] = self.cell_value(cell)
+                # finished rows are emptied so memory stays flat on large sheets
+                element.clear()
+
+                if wanted is None:
+                    self.header = [values.get(index) for index in range(max(values, default=-1) + 1)]
+                    positions = {name: index for index, name in enumerate(self.header)}
+                    if any(not name in positions for name in self.columns):
+                        return
+                    wanted = {positions[name]: offset for offset, name in enumerate(self.columns)}
+                    yield 0, tuple(self.columns)
+                else:
+                    # openpyxl also reports the rows missing from the xml as empty
+                    for empty_index in range(expected_row, row_index):
+                        yield empty_index, (None,) * len(self.columns)
+                    row = [None] * len(self.columns)
+                    for index, offset in wanted.items():
+                        row[offset] = values.get(index)
+                    yield row_index, tuple(row)
+                expected_row = row_index + 1
+
+
+def cast_text(value:str):
+    if value == '':
+        return None
+    if number.match(value):
+        return cast_number(value)
+    return value
+
+
+# csv exports of vInfo are streamed row by row, with numbers cast like xlsx cells
+class CsvReader:
+    def __init__(self, book_name:str, columns:list) -> None:
+        self.book_name = book_name
+        self.columns = columns
+        self.file = open(book_name, newline='', encoding='utf-8-sig')
+        self.header = None
+        self.max_row = None
+        self.has_sheet = True
+
+    def close(self) -> None:
+        self.file.close()
+
+    def rows(self):
+        sample = self.file.read(4096)
+        self.file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        wanted = None
+        for row_index, row in enumerate(csv.reader(self.file, dialect)):
+            if wanted is None:
+                self.header = row
+                positions = {name: index for index, name in enumerate(row)}
+                if any(not name in positions for name in self.columns):
+                    return
+                wanted = [positions[name] for name in self.columns]
+                yield 0, tuple(self.columns)
+            else:
+                yield row_index, tuple(
+                    cast_text(row[index]) if index < len(row) else None
+                    for index in wanted
+                )
+
+
+# parquet files are memory mapped and only the requested columns are decoded
+class ParquetReader:
+    def __init__(self, book_name:str, columns:list) -> None:
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError(f"pyarrow is required to read {book_name}; install it with `pip install pyarrow`")
+        self.book_name = book_name
+        self.columns = columns
+        self.file = pyarrow.parquet.ParquetFile(book_name, memory_map=True)
+        self.header = self.file.schema_arrow.names
+        self.max_row = self.file.metadata.num_rows + 1
+        self.has_sheet = True
+
+    def close(self) -> None:
+        self.file.close()
+
+    def rows(self):
+        if any(not name in self.header for name in self.columns):
+            return
+        yield 0, tuple(self.columns)
+        row_index = 1
+        for batch in self.file.iter_batches(columns=self.columns):
+            values = [batch.column(name).to_pylist() for name in self.columns]
+            for row in zip(*values):
+                yield row_index, row
+                row_index += 1
+
+
+def open_vinfo(book_name:str, columns:list):
+    extension = os.path.splitext(book_name)[1].lower()
+    if extension == '.csv':
+        return CsvReader(book_name, columns)
+    if extension == '.parquet':
+        return ParquetReader(book_name, columns)
+    return VInfoReader(book_name, columns)